@@ -0,0 +1,1088 @@
+#!/usr/bin/env python3
+"""Timing benchmarks for workshop_utils
+
+Usage
+    ./benchmarks.py              # run every benchmark
+    ./benchmarks.py [name] ...   # run the named benchmarks only
+"""
+import json
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import re
+import shutil
+import sys
+import threading
+import tempfile
+import tracemalloc
+
+from functools import reduce
+from sklearn.linear_model import LinearRegression
+from time import perf_counter, sleep
+
+from pypif import pif
+from pypif.obj import ChemicalSystem, Composition, Property, Scalar
+
+import workshop_utils as wu
+
+## Helpers
+##################################################
+# Time a callable
+def timeit(fcn, *args, **kwargs):
+    t0  = perf_counter()
+    res = fcn(*args, **kwargs)
+    return perf_counter() - t0, res
+
+# Time a callable and track its peak Python heap usage
+def peakmem(fcn, *args, **kwargs):
+    tracemalloc.start()
+    t0  = perf_counter()
+    res = fcn(*args, **kwargs)
+    t   = perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return t, peak, res
+
+# Synthetic PIF collection
+def synthetic_pifs(n_systems, n_props = 20, p_missing = 0.2, seed = 101):
+    """Generate ChemicalSystems with numeric properties; a fraction of the
+    properties are dropped or have no scalars, to exercise the nan paths.
+    """
+    rng  = np.random.default_rng(seed)
+    pifs = []
+    for i in range(n_systems):
+        system = ChemicalSystem()
+        system.uid = "sys-{}".format(i)
+        system.chemical_formula = "Fe0.97C0.03"
+        properties = []
+        for j in range(n_props):
+            u = rng.random()
+            if u < p_missing / 2:
+                continue
+            prop = Property()
+            prop.name = "Property {}".format(j)
+            if u < p_missing:
+                prop.scalars = []
+            else:
+                prop.scalars = [Scalar(value = rng.random())]
+            properties.append(prop)
+        system.properties = properties
+        pifs.append(system)
+
+    return pifs
+
+# Formulas drawn from the Agrawal dataset, with repeats
+def sample_formulas(n, seed = 101):
+    formulas = pd.read_csv(os.path.join("data", "agrawal_data.csv"))["chemical_formula"]
+    rng = np.random.default_rng(seed)
+    return formulas.values[rng.integers(len(formulas), size = n)]
+
+# Distinct random formulas
+def random_formulas(n, n_elements = 8, seed = 101):
+    symbols = ["Fe", "C", "Mn", "Cu", "Si", "P", "S", "Ni", "Cr", "Mo", "V", "Ti"]
+    rng = np.random.default_rng(seed)
+    fractions = rng.random((n, n_elements))
+    return np.array([
+        "".join("{}{:.5f}".format(s, x) for s, x in zip(symbols, row))
+        for row in fractions
+    ])
+
+# data/messy_data.csv with renamed columns, imputed and repeated
+def messy_frame(scale = 1):
+    df = pd.read_csv(os.path.join("data", "messy_data.csv")).fillna(0)
+    elements = ["C", "Si", "Mn", "P", "S", "Ni", "Cr", "Cu", "Mo"]
+    df.columns = [
+        "ACTUAL COMPOSITION: {} (wt %)".format(col) if col in elements \
+        else "PROPERTY: Fatigue Strength" if col == "Fatigue" \
+        else "PROPERTY: {}".format(col)
+        for col in df.columns
+    ]
+    return pd.concat([df] * scale, ignore_index = True)
+
+# Local stand-in for CitrinationClient, for the upload helpers
+class LocalDataClient:
+    """Mimics client.data.create_dataset/upload/matched_file_count. Uploads
+    take `latency` seconds, fail at random with probability `p_fail`, and
+    raise `interrupt` (if set) once `n_before_interrupt` files are stored.
+    """
+    def __init__(self, latency = 0.05, p_fail = 0.2, seed = 101):
+        self.data      = self
+        self.latency   = latency
+        self.p_fail    = p_fail
+        self.rng       = np.random.default_rng(seed)
+        self.datasets  = {}
+        self.attempts  = 0
+        self.interrupt = None
+        self.n_before_interrupt = None
+        self._lock = threading.Lock()
+
+    def create_dataset(self, name, description, public = False):
+        dataset = type("Dataset", (), {"id": len(self.datasets) + 1})()
+        self.datasets[dataset.id] = set()
+        return dataset
+
+    def upload(self, dataset_id, source_path):
+        sleep(self.latency)
+        with self._lock:
+            self.attempts += 1
+            if self.interrupt is not None \
+               and len(self.datasets[dataset_id]) >= self.n_before_interrupt:
+                raise self.interrupt
+            if self.rng.random() < self.p_fail:
+                raise ConnectionError("Simulated upload failure")
+            self.datasets[dataset_id].add(os.path.basename(source_path))
+
+    def matched_file_count(self, dataset_id):
+        return len(self.datasets[dataset_id])
+
+# Local stand-in for CitrinationClient(...).search
+class LocalSearchClient:
+    """Serves pif_search() pages from a list of PIFs, with request latency"""
+    def __init__(self, pifs, latency = 0.05):
+        self.pifs     = pifs
+        self.latency  = latency
+        self.requests = 0
+
+    def pif_search(self, query):
+        sleep(self.latency)
+        self.requests += 1
+        start = query.from_index or 0
+        hits  = [
+            type("Hit", (), {"system": system})()
+            for system in self.pifs[start:start + query.size]
+        ]
+        return type("Result", (), {"total_num_hits": len(self.pifs), "hits": hits})()
+
+class Interrupted(BaseException):
+    """Simulated kill of an upload; not caught by the retry loop"""
+
+## Reference implementations
+##################################################
+# pifs2df() as it was before the single-pass engine
+def pifs2df_reference(pifs):
+    key_sets = [set(wu.ReadView(pif).keys()) for pif in pifs]
+    keys_ref = reduce(lambda s1, s2: s1.union(s2), key_sets)
+
+    return pd.DataFrame(
+        columns = list(keys_ref),
+        data = [[wu.parsePifKey(pif, key) for key in keys_ref] for pif in pifs]
+    )
+
+# parse_formula() as it was before the compiled tokenizer
+def parse_formula_reference(formula):
+    return dict(map(
+        lambda s: (
+            re.search(r'\D+', s).group(),
+            float(re.search(r'[\d\.]+', s).group())
+        ),
+        re.findall(r'\w+[\d\.]+', formula)
+    ))
+
+# formulas2df() as it was before the composition matrix builder; the removed
+# DataFrame.append() is spelled with pd.concat()
+def formulas2df_reference(formulas):
+    all_compositions = [parse_formula_reference(formula) for formula in formulas]
+    all_elements = reduce(
+        lambda s1, s2: s1.union(s2),
+        [set(d.keys()) for d in all_compositions]
+    )
+
+    df_composition = pd.DataFrame(columns = sorted(all_elements))
+    for composition in all_compositions:
+        df_composition = pd.concat(
+            [df_composition, pd.DataFrame(
+                columns = composition.keys(),
+                data = [composition.values()]
+            )],
+            ignore_index = True,
+            sort = True
+        )
+        df_composition = df_composition.fillna(0)
+
+    return df_composition
+
+# One simulator replication with setxor1d/concatenate pool bookkeeping
+def sl_replication_reference(X, Y, n_init, n_iter, model, seed):
+    rng       = np.random.default_rng(seed)
+    n_total   = Y.shape[0]
+    ind_all   = range(n_total)
+    ind_train = rng.choice(n_total, n_init, replace = False)
+    for jnd in range(n_iter):
+        reg         = model.fit(X[ind_train], Y[ind_train])
+        ind_test    = np.setxor1d(ind_all, ind_train)
+        Y_pred_test = reg.predict(X[ind_test])
+        ind_best    = ind_test[np.argmax(Y_pred_test)]
+        ind_train   = np.concatenate((ind_train, [ind_best]))
+
+    return ind_train
+
+# plotHistory() statistics as they were computed before summarizeHistory()
+def history_statistics_reference(acq_history, Y, n_init):
+    acq_history = acq_history.astype(float)
+    Y_hist = np.array([Y[acq_history[i, :].astype(int)] for i in range(acq_history.shape[0])])
+    Y_hist = np.concatenate(
+        (np.atleast_2d(np.mean(Y_hist[:, :n_init], axis = 1)).T, Y_hist[:, n_init:]),
+        axis = 1
+    )
+    Y_max = np.maximum.accumulate(Y_hist, axis = 1)
+    return np.mean(Y_max, axis = 0), np.median(Y_max, axis = 0), \
+        np.quantile(Y_max, 0.9, axis = 0)
+
+# Early-stopping points replayed from a history, one acquisition at a time
+def early_stops_reference(acq_history, Y, n_init, target = None, patience = None,
+                          max_fits = None):
+    stops = []
+    for row in acq_history:
+        Y_best, since_best, n_train = Y[row[:n_init]].max(), 0, n_init
+        while n_train < len(row):
+            if (target is not None and Y_best >= target) \
+                    or (patience is not None and since_best >= patience) \
+                    or (max_fits is not None and n_train - n_init >= max_fits):
+                break
+            if Y[row[n_train]] > Y_best:
+                Y_best, since_best = Y[row[n_train]], 0
+            else:
+                since_best += 1
+            n_train += 1
+        stops.append(n_train)
+
+    return np.array(stops)
+
+# add_chemical_formula() and fix_fatigue_strength() as iterrows() loops
+def add_chemical_formula_reference(df):
+    comp_cols = [col for col in list(df) if 'ACTUAL COMP' in col]
+    formulas_list = []
+    for index, row in df[comp_cols].iterrows():
+        formula = ''
+        for col in comp_cols:
+            if row[col] > 1e-3:
+                formula += col.split(' ')[2] + '{0:.5f}'.format(row[col]/100).rstrip('0')
+        formulas_list.append(formula)
+    df['FORMULA'] = formulas_list
+    return df
+
+def fix_fatigue_strength_reference(df):
+    prop_name = 'PROPERTY: Fatigue Strength'
+    for index, row in df.iterrows():
+        if row[prop_name] < 10.0:
+            df.at[index, prop_name] *= 1000
+    return df
+
+# Header mappings and csv_to_pifs() as iterrows() loops
+def create_mapping_from_table_reference(header_csv, units = False):
+    mapping = {}
+    for index, row in pd.read_csv(header_csv).iterrows():
+        details = row['Details'].lower()
+        if row['Details'].startswith('%'):
+            mapping[row['Abbreviation']] = 'ACTUAL COMPOSITION: {} (wt %)'.format(
+                row['Abbreviation'])
+        elif units and 'fatigue' in details:
+            mapping[row['Abbreviation']] = 'PROPERTY: {} (MPa)'.format(row['Details'])
+        elif units and 'temperature' in details:
+            mapping[row['Abbreviation']] = 'PROPERTY: {} (C)'.format(row['Details'])
+        elif units and 'time' in details:
+            mapping[row['Abbreviation']] = 'PROPERTY: {} (min)'.format(row['Details'])
+        elif units and 'rate' in details:
+            mapping[row['Abbreviation']] = 'PROPERTY: {} (C/hr)'.format(row['Details'])
+        else:
+            mapping[row['Abbreviation']] = 'PROPERTY: {}'.format(row['Details'])
+    return mapping
+
+def csv_to_pifs_reference(df, fpath):
+    systems = []
+    for i, row in df.iterrows():
+        system = ChemicalSystem()
+        system.chemical_formula = row['FORMULA']
+        composition = []
+        properties = []
+        for col in list(df):
+            if 'ACTUAL COMP' in col:
+                if row[col] > 1e-3:
+                    comp = Composition()
+                    comp.element = col.split(' ')[2]
+                    comp.actual_weight_percent = Scalar(value=row[col])
+                    composition.append(comp)
+            elif 'PROPERTY' in col:
+                prop = Property()
+                prop.name = ' '.join(col.split(' ')[1:])
+                prop.scalars = [Scalar(value=row[col])]
+                properties.append(prop)
+        system.composition = composition
+        system.properties = properties
+        systems.append(system)
+    with open(fpath, 'w') as f:
+        pif.dump(systems, f, indent=4)
+
+# Header definitions for data/messy_data.csv, covering every mapping branch
+MESSY_HEADER = [
+    ("No.", "Sample number"),
+    ("NT", "Normalizing Temperature"),
+    ("THT", "Through Hardening Temperature"),
+    ("THt", "Through Hardening Time"),
+    ("THQCr", "Cooling Rate for Through Hardening"),
+    ("C", "% Carbon"),
+    ("Si", "% Silicon"),
+    ("RedRatio", "Reduction Ratio (Ingot to Bar)"),
+    ("Fatigue", "Rotating Bending Fatigue Strength (10^7 Cycles)"),
+]
+
+## Benchmarks
+##################################################
+def bench_pifs2df(sizes = (1000, 10000, 100000), n_reference_max = 10000):
+    """Single-pass pifs2df() against the per-cell ReadView reference"""
+    print("pifs2df: single-pass engine vs. per-cell ReadView")
+    print("{0:>8} {1:>12} {2:>12} {3:>8}".format("n", "reference", "engine", "speedup"))
+    for n in sizes:
+        pifs = synthetic_pifs(n)
+        t_new, df_new = timeit(wu.pifs2df, pifs)
+        if n <= n_reference_max:
+            t_ref, df_ref = timeit(pifs2df_reference, pifs)
+            pd.testing.assert_frame_equal(
+                df_new, df_ref[df_new.columns], check_dtype = False
+            )
+            print("{0:8d} {1:11.3f}s {2:11.3f}s {3:7.1f}x".format(
+                n, t_ref, t_new, t_ref / t_new
+            ))
+        else:
+            print("{0:8d} {1:>12} {2:11.3f}s {3:>8}".format(n, "(skipped)", t_new, "-"))
+
+def bench_stream(sizes = (1000, 10000), chunksize = 1000):
+    """Peak memory of streamPifs2df() against json.load() + pifs2df()"""
+    def load_all(fpath):
+        with open(fpath, "r") as f:
+            return wu.pifs2df(pif.load(f)).shape
+
+    def stream_all(fpath):
+        n_rows = 0
+        for df in wu.streamPifs2df(fpath, chunksize = chunksize):
+            n_rows += df.shape[0]
+        return n_rows
+
+    print("streamPifs2df: peak Python heap, chunksize = {}".format(chunksize))
+    print("{0:>8} {1:>12} {2:>12} {3:>10} {4:>10}".format(
+        "n", "load (MB)", "stream (MB)", "load", "stream"
+    ))
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            fpath = os.path.join(tmp, "pifs.json")
+            with open(fpath, "w") as f:
+                pif.dump(synthetic_pifs(n), f)
+            t_load, m_load, _     = peakmem(load_all, fpath)
+            t_stream, m_stream, _ = peakmem(stream_all, fpath)
+        print("{0:8d} {1:12.1f} {2:12.1f} {3:9.2f}s {4:9.2f}s".format(
+            n, m_load / 2**20, m_stream / 2**20, t_load, t_stream
+        ))
+
+    ## Chunks share the whole file's schema; malformed arrays are rejected
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, "pifs.json")
+        pifs  = synthetic_pifs(250)
+        for ind, system in enumerate(pifs):
+            if ind >= 100:  # a string property missing from the first chunk
+                system.properties.append(Property(name = "Phase", scalars = [Scalar(value = "bcc")]))
+        with open(fpath, "w") as f:
+            pif.dump(pifs, f)
+        with open(fpath, "r") as f:
+            whole = wu.pifs2df(pif.load(f))
+        pd.testing.assert_frame_equal(
+            pd.concat(wu.streamPifs2df(fpath, chunksize = 100), ignore_index = True), whole
+        )
+        for text in ("[1 2]", "[1,,2]", "[1,2,]", "[1,2", "[1]x"):
+            with open(fpath, "w") as f:
+                f.write(text)
+            try:
+                list(wu._iterJsonArray(fpath, block_size = 1))
+            except ValueError:
+                continue
+            raise AssertionError("accepted {}".format(text))
+        with open(fpath, "w") as f:
+            f.write("  [ 1.5e3 ]")
+        assert list(wu._iterJsonArray(fpath, block_size = 1)) == [1500.0]
+
+def bench_formulas(n = 1000000, n_reference = 100000):
+    """Throughput of parse_formulas() in formulas/second"""
+    print("parse_formulas: throughput on {} formulas".format(n))
+    print("{0:>32} {1:>14}".format("case", "formulas/s"))
+    for case, formulas in [
+            ("repeated (Agrawal)", sample_formulas(n)),
+            ("distinct (random)",  random_formulas(n)),
+    ]:
+        t_ref, _ = timeit(
+            lambda fs: [parse_formula_reference(f) for f in fs],
+            formulas[:n_reference]
+        )
+        wu._parseFormulaCached.cache_clear()
+        t_cold, _ = timeit(wu.parse_formulas, formulas)
+        t_warm, _ = timeit(wu.parse_formulas, formulas)
+        print("{0:>32} {1:14.0f}".format(case + ", reference", n_reference / t_ref))
+        print("{0:>32} {1:14.0f}".format(case + ", cold cache", n / t_cold))
+        print("{0:>32} {1:14.0f}".format(case + ", warm cache", n / t_warm))
+
+def bench_composition(n = 100000, n_reference = 2000):
+    """formulas2df() with the triplet builder against the append loop"""
+    formulas = sample_formulas(n)
+    t_ref, df_ref = timeit(formulas2df_reference, formulas[:n_reference])
+    t_new, df_new = timeit(wu.formulas2df, formulas[:n_reference])
+    pd.testing.assert_frame_equal(df_new, df_ref.astype(float))
+    print("formulas2df: triplet builder vs. append loop")
+    print("{0:>24} {1:>8} {2:>10}".format("case", "n", "time"))
+    print("{0:>24} {1:8d} {2:9.3f}s".format("append loop", n_reference, t_ref))
+    print("{0:>24} {1:8d} {2:9.3f}s".format("builder, DataFrame", n_reference, t_new))
+
+    wu._parseFormulaCached.cache_clear()
+    t_build, comp = timeit(wu.CompositionMatrix.from_formulas, formulas)
+    t_dense, _    = timeit(comp.to_frame)
+    t_csr, _      = timeit(comp.to_csr)
+    print("{0:>24} {1:8d} {2:9.3f}s".format("builder, accumulate", n, t_build))
+    print("{0:>24} {1:8d} {2:9.3f}s".format("  + DataFrame", n, t_dense))
+    print("{0:>24} {1:8d} {2:9.3f}s".format("  + CSR", n, t_csr))
+
+def bench_pool(sizes = (10000, 100000, 1000000), n_features = 8, n_iter = 20):
+    """Per-iteration cost of the simulator's candidate-pool bookkeeping"""
+    print("sequential learning: per-iteration time, mask vs. setxor1d pool")
+    print("{0:>8} {1:>14} {2:>14}".format("n", "setxor1d", "mask"))
+    rng = np.random.default_rng(101)
+    for n in sizes:
+        X = rng.random((n, n_features))
+        Y = X @ rng.random(n_features) + 0.1 * rng.random(n)
+        seed = np.random.SeedSequence(101)
+        t_ref, ind_ref = timeit(
+            sl_replication_reference, X, Y, wu.N_INIT, n_iter, LinearRegression(), seed
+        )
+        t_new, ind_new = timeit(
+            wu._slReplication, X, Y, wu.N_INIT, n_iter, LinearRegression(),
+            1, wu.acquireGreedy, seed
+        )
+        assert np.array_equal(ind_ref, ind_new)
+        print("{0:8d} {1:12.2f}ms {2:12.2f}ms".format(
+            n, 1e3 * t_ref / n_iter, 1e3 * t_new / n_iter
+        ))
+
+def bench_incremental(n = 20000, n_features = 20, n_iters = (500, 2000, 5000)):
+    """Long campaigns with IncrementalLinearRegression against refitting"""
+    print("sequential learning: incremental linear surrogate vs. refit, n = {}".format(n))
+    print("{0:>8} {1:>10} {2:>12} {3:>14}".format("n_iter", "refit", "incremental", "max |dY_pred|"))
+    rng = np.random.default_rng(101)
+    X = rng.random((n, n_features))
+    Y = X @ rng.random(n_features) + 0.1 * rng.random(n)
+    for n_iter in n_iters:
+        t_ref, h_ref = timeit(
+            wu.sequentialLearningSimulator, X, Y,
+            n_iter = n_iter, n_repl = 1, model = LinearRegression()
+        )
+        t_new, h_new = timeit(
+            wu.sequentialLearningSimulator, X, Y,
+            n_iter = n_iter, n_repl = 1, model = wu.IncrementalLinearRegression()
+        )
+        ## Replay the incremental campaign; compare against a full refit
+        ind = h_new[0].astype(int)
+        inc = wu.IncrementalLinearRegression().fit(X[ind[:wu.N_INIT]], Y[ind[:wu.N_INIT]])
+        for i in ind[wu.N_INIT:]:
+            inc.update(X[[i]], Y[[i]])
+        err = np.max(np.abs(inc.predict(X) - LinearRegression().fit(X[ind], Y[ind]).predict(X)))
+        print("{0:8d} {1:9.2f}s {2:11.2f}s {3:14.2e}".format(n_iter, t_ref, t_new, err))
+
+    ## Compositions sum to one, so their centered scatter matrix is singular
+    df = pd.read_csv(os.path.join("data", "agrawal_data.csv"))
+    X  = wu.formulas2df(df["chemical_formula"]).values
+    Y  = df["Fatigue Strength"].values
+    n_iter = len(Y) - wu.N_INIT
+    t_ref, h_ref = timeit(
+        wu.sequentialLearningSimulator, X, Y, n_iter = n_iter, n_repl = 1,
+        model = LinearRegression(), vectorize = False
+    )
+    t_new, h_new = timeit(
+        wu.sequentialLearningSimulator, X, Y, n_iter = n_iter, n_repl = 1,
+        model = wu.IncrementalLinearRegression()
+    )
+    ind = h_new[0].astype(int)
+    inc = wu.IncrementalLinearRegression().fit(X[ind[:wu.N_INIT]], Y[ind[:wu.N_INIT]])
+    for i in ind[wu.N_INIT:]:
+        inc.update(X[[i]], Y[[i]])
+    assert inc.Q_.shape[1] == np.linalg.matrix_rank(X - X.mean(axis = 0))
+    err = np.max(np.abs(inc.predict(X) - LinearRegression().fit(X, Y).predict(X)))
+    assert err < 1e-6 * np.std(Y)
+    print("Agrawal compositions, rank {} of {}:".format(inc.Q_.shape[1], X.shape[1]))
+    print("{0:8d} {1:9.2f}s {2:11.2f}s {3:14.2e}".format(n_iter, t_ref, t_new, err))
+
+def bench_summary(shapes = ((50, 40), (1000, 1000), (5000, 2000)), n = 100000):
+    """summarizeHistory() against the per-replication gather"""
+    print("summarizeHistory: vectorized vs. per-replication gather")
+    print("{0:>8} {1:>8} {2:>12} {3:>12}".format("n_repl", "n_iter", "reference", "vectorized"))
+    rng = np.random.default_rng(101)
+    Y   = rng.random(n)
+    for n_repl, n_iter in shapes:
+        acq_history = rng.integers(n, size = (n_repl, wu.N_INIT + n_iter))
+        t_ref, (mean, median, upper) = timeit(
+            history_statistics_reference, acq_history, Y, wu.N_INIT
+        )
+        t_new, summary = timeit(wu.summarizeHistory, acq_history, Y, wu.N_INIT)
+        assert np.allclose(summary.median, median) and np.allclose(summary.bands[-1], upper)
+        print("{0:8d} {1:8d} {2:10.1f}ms {3:10.1f}ms".format(
+            n_repl, n_iter, 1e3 * t_ref, 1e3 * t_new
+        ))
+
+def bench_cleaning(scales = (10, 100, 1000), n_reference_max = 10):
+    """Vectorized cleaning helpers on data/messy_data.csv scaled up"""
+    def reference(df):
+        return fix_fatigue_strength_reference(add_chemical_formula_reference(
+            wu.add_iron_composition(df)
+        ))
+
+    def vectorized(df):
+        return wu.fix_fatigue_strength(wu.add_chemical_formula(
+            wu.add_iron_composition(df)
+        ))
+
+    rows = []
+    for scale in scales:
+        df = messy_frame(scale)
+        t_new, df_new = timeit(vectorized, df.copy())
+        if scale <= n_reference_max:
+            t_ref, df_ref = timeit(reference, df.copy())
+            pd.testing.assert_frame_equal(df_new, df_ref)
+        else:
+            t_ref = np.nan
+        rows.append((scale, df.shape[0], t_ref, t_new))
+
+    print()
+    print("cleaning: iron, formula and fatigue fix; iterrows vs. vectorized")
+    print("{0:>6} {1:>9} {2:>10} {3:>11}".format("scale", "rows", "iterrows", "vectorized"))
+    for scale, n, t_ref, t_new in rows:
+        print("{0:6d} {1:9d} {2:>10} {3:10.2f}s".format(
+            scale, n, "-" if np.isnan(t_ref) else "{0:.2f}s".format(t_ref), t_new
+        ))
+
+    ## Header mappings and the PIF file match the iterrows() loops
+    with tempfile.TemporaryDirectory() as tmp:
+        header_csv = os.path.join(tmp, "header.csv")
+        pd.DataFrame(MESSY_HEADER, columns = ["Abbreviation", "Details"]).to_csv(
+            header_csv, index = False
+        )
+        assert wu.create_mapping_from_table(header_csv) == \
+            create_mapping_from_table_reference(header_csv)
+        assert wu.create_mapping_from_table_w_units(header_csv) == \
+            create_mapping_from_table_reference(header_csv, units = True)
+
+        df = vectorized(messy_frame())
+        outputs = []
+        for write in (csv_to_pifs_reference, wu.csv_to_pifs):
+            fpath = os.path.join(tmp, "pifs.json")
+            write(df, fpath)
+            with open(fpath) as f:
+                outputs.append(f.read())
+        assert outputs[0] == outputs[1]
+
+    ## CleaningPipeline.run_csv: chunked output must match a single read
+    src = os.path.join("data", "messy_data.csv")
+    elements = ["C", "Si", "Mn", "P", "S", "Ni", "Cr", "Cu", "Mo"]
+    mapping = {
+        col: "ACTUAL COMPOSITION: {} (wt %)".format(col) if col in elements \
+        else "PROPERTY: Fatigue Strength" if col == "Fatigue" \
+        else "PROPERTY: {}".format(col)
+        for col in pd.read_csv(src, nrows = 0).columns
+    }
+    pipeline = (wu.CleaningPipeline().rename_columns(mapping).fillna(0)
+                .add_iron_composition().add_chemical_formula().fix_fatigue_strength())
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = []
+        for chunksize in (None, 50):
+            dst = os.path.join(tmp, "cleaned_{}.csv".format(chunksize))
+            pipeline.run_csv(src, dst, chunksize = chunksize, verbose = False)
+            with open(dst) as f:
+                outputs.append(f.read())
+        assert outputs[0] == outputs[1]
+
+def bench_pif_writer(scales = (1, 10, 20), chunksize = 1000):
+    """Peak memory of csv_to_pifs() streaming CSV chunks, as rows grow"""
+    df = wu.add_chemical_formula(wu.add_iron_composition(messy_frame()))
+    print("csv_to_pifs: streamed CSV chunks, chunksize = {}".format(chunksize))
+    print("{0:>8} {1:>10} {2:>10} {3:>12}".format("rows", "style", "time", "peak (MB)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            src = os.path.join(tmp, "cleaned.csv")
+            pd.concat([df] * scale).to_csv(src, index = False)
+            for style in ("indent", "compact", "ndjson"):
+                t, peak, _ = peakmem(
+                    wu.csv_to_pifs,
+                    pd.read_csv(src, chunksize = chunksize),
+                    os.path.join(tmp, "out.json"),
+                    style = style
+                )
+                print("{0:8d} {1:>10} {2:9.2f}s {3:12.1f}".format(
+                    df.shape[0] * scale, style, t, peak / 2**20
+                ))
+
+def bench_upload(n = 20000, shard_size = 1000, workers = (1, 4, 8)):
+    """Sharded upload against a local stand-in client, then a resume"""
+    print("create_and_upload_data: {} PIFs, shard_size = {}".format(n, shard_size))
+    print("{0:>8} {1:>8} {2:>9} {3:>9}".format("workers", "time", "attempts", "files"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fpath = os.path.join(tmp, "pifs.json")
+        with open(fpath, "w") as f:
+            pif.dump(synthetic_pifs(n, n_props = 5), f)
+
+        n_shards = -(-n // shard_size)
+        for n_workers in workers:
+            client = LocalDataClient()
+            t, dataset_id = timeit(
+                wu.create_and_upload_data, client, fpath, "bench", "bench",
+                shard_size = shard_size, max_workers = n_workers
+            )
+            assert client.matched_file_count(dataset_id) == n_shards
+            assert os.listdir(tmp) == ["pifs.json"]  # no shards or manifest left
+            print("{0:8d} {1:7.2f}s {2:9d} {3:9d}".format(
+                n_workers, t, client.attempts, client.matched_file_count(dataset_id)
+            ))
+
+        ## Interrupt part-way, then rerun: only the remaining shards upload
+        client = LocalDataClient(p_fail = 0.0)
+        client.interrupt, client.n_before_interrupt = Interrupted(), n_shards // 2
+        try:
+            wu.create_and_upload_data(client, fpath, "bench", "bench",
+                                      shard_size = shard_size, max_workers = 4)
+        except Interrupted:
+            pass
+        n_first, n_done = client.attempts, client.matched_file_count(1)
+        client.interrupt = None
+        dataset_id = wu.create_and_upload_data(client, fpath, "bench", "bench",
+                                               shard_size = shard_size, max_workers = 4)
+        assert dataset_id == 1 and len(client.datasets) == 1
+        assert client.attempts - n_first == n_shards - n_done
+        assert client.matched_file_count(dataset_id) == n_shards
+        assert os.listdir(tmp) == ["pifs.json"]
+        print("resume: {} attempts before the interruption, {} after; {} files in dataset {}".format(
+            n_first, client.attempts - n_first, client.matched_file_count(dataset_id), dataset_id
+        ))
+
+        ## A resume must refuse a source file changed since the interruption
+        client = LocalDataClient(p_fail = 0.0)
+        client.interrupt, client.n_before_interrupt = Interrupted(), 1
+        try:
+            wu.create_and_upload_data(client, fpath, "bench", "bench",
+                                      shard_size = shard_size, max_workers = 1)
+        except Interrupted:
+            pass
+        with open(fpath, "a") as f:
+            f.write("\n")
+        try:
+            wu.create_and_upload_data(client, fpath, "bench", "bench",
+                                      shard_size = shard_size, max_workers = 1)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("resumed an upload of a changed file")
+
+def bench_fetch(n = 5000, page_size = 100, workers = (1, 8)):
+    """Paginated fetchPifs() against a local stand-in search client"""
+    from citrination_client import PifSystemReturningQuery, DataQuery, DatasetQuery, Filter
+
+    query = PifSystemReturningQuery(
+        size = 500,
+        query = DataQuery(dataset = DatasetQuery(id = Filter(equal = "150670")))
+    )
+    client = LocalSearchClient(synthetic_pifs(n, n_props = 5))
+    print("fetchPifs: {} PIFs, page_size = {}".format(n, page_size))
+    print("{0:>20} {1:>8} {2:>9}".format("case", "time", "requests"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_workers in workers:
+            client.requests = 0
+            t, pifs = timeit(
+                wu.fetchPifs, client, query, page_size = page_size,
+                max_workers = n_workers, cache_dir = tmp, refresh = True
+            )
+            assert len(pifs) == n
+            print("{0:>20} {1:7.2f}s {2:9d}".format(
+                "cold, {} workers".format(n_workers), t, client.requests
+            ))
+        client.requests = 0
+        t, pifs = timeit(wu.fetchPifs, client, query, page_size = page_size, cache_dir = tmp)
+        assert [p.uid for p in pifs] == [p.uid for p in client.pifs]
+        print("{0:>20} {1:7.2f}s {2:9d}".format("warm cache", t, client.requests))
+
+def bench_frame_cache(scales = (100, 1000), columns = ("Band Gap", "Density")):
+    """Cold vs warm cachedPifs2df() on citrination_ui_pifs.json, scaled up"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("cachedPifs2df: pyarrow not installed, skipped")
+        return
+
+    with open(os.path.join("data", "citrination_ui_pifs.json"), "r") as f:
+        records = json.load(f)
+    print("cachedPifs2df: citrination_ui_pifs.json x scale")
+    print("{0:>8} {1:>8} {2:>9} {3:>12} {4:>9} {5:>10}".format(
+        "rows", "cold", "warm", "warm, 2 cols", "hash", "file (MB)"
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            src = os.path.join(tmp, "pifs{}.json".format(scale))
+            with open(src, "w") as f:
+                json.dump(records * scale, f)
+            cache_dir = os.path.join(tmp, "cache")
+            t_cold, df_cold = timeit(wu.cachedPifs2df, src, cache_dir = cache_dir)
+            t_warm, df_warm = timeit(wu.cachedPifs2df, src, cache_dir = cache_dir)
+            t_cols, df_cols = timeit(
+                wu.cachedPifs2df, src, columns = list(columns), cache_dir = cache_dir
+            )
+            pd.testing.assert_frame_equal(df_cold, df_warm)
+            pd.testing.assert_frame_equal(df_cold[list(columns)], df_cols)
+            size = sum(
+                os.path.getsize(os.path.join(cache_dir, "frames", name)) \
+                for name in os.listdir(os.path.join(cache_dir, "frames"))
+            )
+            t_hash, _ = timeit(wu._fileKey, src)
+            print("{0:8d} {1:7.2f}s {2:8.3f}s {3:11.3f}s {4:8.3f}s {5:10.1f}".format(
+                len(df_cold), t_cold, t_warm, t_cols, t_hash, size / 2**20
+            ))
+            shutil.rmtree(cache_dir)
+
+def bench_records(n = 20000, n_props = 20):
+    """PifRecord vs pypif objects + ReadView: memory per record and throughput"""
+    raw = json.loads(pif.dumps(synthetic_pifs(n, n_props = n_props)))
+
+    def held(fcn):
+        tracemalloc.start()
+        t0  = perf_counter()
+        res = fcn()
+        t   = perf_counter() - t0
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return t, size, res
+
+    t_pifs, b_pifs, pifs = held(lambda: pif.loado(raw))
+    t_recs, b_recs, recs = held(lambda: [wu.PifRecord.from_dict(d) for d in raw])
+    t_views, _ = timeit(lambda: [wu._pifScalars(p) for p in pifs])
+    t_df_pifs, df_pifs = timeit(wu.pifs2df, pifs)
+    t_df_recs, df_recs = timeit(wu.records2df, recs)
+    pd.testing.assert_frame_equal(df_pifs, df_recs)
+
+    print("PifRecord: {} raw PIF dicts, {} properties".format(n, n_props))
+    print("{0:>28} {1:>12} {2:>10}".format("case", "records/s", "bytes/rec"))
+    print("{0:>28} {1:12.0f} {2:10.0f}".format(
+        "pif.loado + ReadView", n / (t_pifs + t_views), b_pifs / n
+    ))
+    print("{0:>28} {1:12.0f} {2:10.0f}".format(
+        "PifRecord.from_dict", n / t_recs, b_recs / n
+    ))
+    print("{0:>28} {1:11.2f}s".format("pifs2df", t_df_pifs))
+    print("{0:>28} {1:11.2f}s".format("records2df", t_df_recs))
+
+def bench_flatten_parallel(n = 20000, workers = (2, 4, 8, 16)):
+    """Sharded multi-process pifs2df() scaling, with the IPC volume per shard"""
+    pifs = synthetic_pifs(n)
+    t_serial, df_serial = timeit(wu.pifs2df, pifs)
+    shard = pifs[:n // 64]
+    sent  = len(pickle.dumps(shard))
+    recv  = len(pickle.dumps(wu._pifTriplets(shard)))
+    print("pifs2df(n_jobs): {} PIFs on {} cores".format(n, os.cpu_count()))
+    print("IPC per {}-PIF shard: {:.0f} kB returned; {:.0f} kB sent if the PIFs".format(
+        len(shard), recv / 2**10, sent / 2**10
+    ) + " are pickled (forked workers get only slice bounds)")
+    print("{0:>8} {1:>8} {2:>8}".format("n_jobs", "time", "speedup"))
+    print("{0:>8} {1:7.2f}s {2:7.2f}x".format("serial", t_serial, 1.0))
+    for n_jobs in workers:
+        t, df = timeit(wu.pifs2df, pifs, n_jobs = n_jobs)
+        pd.testing.assert_frame_equal(df, df_serial)
+        print("{0:>8} {1:7.2f}s {2:7.2f}x".format(n_jobs, t, t_serial / t))
+
+def bench_registry(n = 200000, n_batches = 50):
+    """Batched composition matrices: concat + reindex vs a SchemaRegistry
+    writing each batch into one preallocated array"""
+    formulas = random_formulas(n)
+    batches  = np.array_split(np.asarray(formulas, dtype = object), n_batches)
+
+    def concat():
+        return pd.concat(
+            [wu.formulas2df(batch) for batch in batches], ignore_index = True
+        ).fillna(0.0)
+
+    def aligned():
+        registry = wu.SchemaRegistry()
+        comps    = [wu.CompositionMatrix.from_formulas(batch) for batch in batches]
+        for comp in comps:
+            registry.indices(comp._index)
+        X = np.empty((n, len(registry)))
+        start = 0
+        for comp in comps:
+            comp.to_array(registry, out = X[start:start + comp.n_rows])
+            start += comp.n_rows
+        return pd.DataFrame(columns = registry.names, data = X, copy = False)
+
+    t_concat, df_concat   = timeit(concat)
+    t_aligned, df_aligned = timeit(aligned)
+    pd.testing.assert_frame_equal(
+        df_aligned[sorted(df_aligned.columns)], df_concat[sorted(df_concat.columns)]
+    )
+    print("SchemaRegistry: {} formulas in {} batches".format(n, n_batches))
+    print("{0:>28} {1:7.2f}s".format("formulas2df + concat", t_concat))
+    print("{0:>28} {1:7.2f}s".format("registry, preallocated", t_aligned))
+
+def bench_surrogates(n = 2000, n_features = 8, n_iter = 40, n_repl = 3):
+    """Wall time per campaign: warm-start surrogates vs. cold refits"""
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.gaussian_process import GaussianProcessRegressor
+
+    rng = np.random.default_rng(101)
+    X = rng.random((n, n_features))
+    Y = np.sin(3 * X[:, 0]) + X[:, 1:] @ rng.random(n_features - 1) \
+        + 0.05 * rng.standard_normal(n)
+    forest = RandomForestRegressor(n_estimators = 50, random_state = 0)
+    gp     = GaussianProcessRegressor(normalize_y = True)
+    cases  = [
+        ("LinearRegression", LinearRegression()),
+        ("IncrementalLinearRegression", wu.IncrementalLinearRegression()),
+        ("RandomForestRegressor", forest),
+        ("ForestSurrogate", wu.ForestSurrogate(forest, n_grow = 5)),
+        ("GradientBoostingRegressor", GradientBoostingRegressor()),
+        ("BoostingSurrogate", wu.BoostingSurrogate(n_grow = 5)),
+        ("GaussianProcessRegressor", gp),
+        ("GaussianProcessSurrogate", wu.GaussianProcessSurrogate(gp)),
+    ]
+    print("sequential learning surrogates: n = {}, n_iter = {}, {} campaigns".format(
+        n, n_iter, n_repl
+    ))
+    print("{0:>28} {1:>14} {2:>10}".format("model", "s / campaign", "mean best"))
+    for name, model in cases:
+        t, history = timeit(
+            wu.sequentialLearningSimulator, X, Y,
+            n_iter = n_iter, n_repl = n_repl, model = model
+        )
+        print("{0:>28} {1:13.2f}s {2:10.3f}".format(
+            name, t / n_repl, Y[history].max(axis = 1).mean()
+        ))
+
+def bench_lockstep(n_repls = (50, 1000), n_iter = 40):
+    """Lockstep (stacked-solve) replications vs. the replication loop"""
+    from sklearn.linear_model import Ridge
+
+    df = pd.read_csv(os.path.join("data", "agrawal_data.csv"))
+    X  = wu.formulas2df(df["chemical_formula"]).values
+    Y  = df["Fatigue Strength"].values
+    print("sequential learning, Agrawal compositions: lockstep vs. loop, n_iter = {}".format(n_iter))
+    print("{0:>18} {1:>7} {2:>9} {3:>9} {4:>8} {5:>12}".format(
+        "model", "n_repl", "loop", "lockstep", "speedup", "tied repls"
+    ))
+    for name, model in [("LinearRegression", LinearRegression()), ("Ridge", Ridge(alpha = 1e-3))]:
+        for n_repl in n_repls:
+            t_loop, h_loop = timeit(
+                wu.sequentialLearningSimulator, X, Y, n_iter = n_iter,
+                n_repl = n_repl, model = model, vectorize = False
+            )
+            t_lock, h_lock = timeit(
+                wu.sequentialLearningSimulator, X, Y, n_iter = n_iter,
+                n_repl = n_repl, model = model
+            )
+            ## Differences may only come from candidates with identical features
+            differ = np.flatnonzero((h_loop != h_lock).any(axis = 1))
+            for ind in differ:
+                col = np.argmax(h_loop[ind] != h_lock[ind])
+                assert (X[h_loop[ind, col]] == X[h_lock[ind, col]]).all()
+            print("{0:>18} {1:7d} {2:8.2f}s {3:8.2f}s {4:7.1f}x {5:12d}".format(
+                name, n_repl, t_loop, t_lock, t_loop / t_lock, len(differ)
+            ))
+
+def bench_early_stop(n_repl = 200, n_iter = 100):
+    """Campaign cost with early stopping vs. the full n_iter"""
+    df = pd.read_csv(os.path.join("data", "agrawal_data.csv"))
+    X  = wu.formulas2df(df["chemical_formula"]).values
+    Y  = df["Fatigue Strength"].values
+    ## Distinct compositions only, so the lockstep can't break ties differently
+    X, ind_unique = np.unique(X, axis = 0, return_index = True)
+    Y  = Y[ind_unique]
+    cases = [
+        ("full", {}),
+        ("target = max", dict(target = "max")),
+        ("patience = 10", dict(patience = 10)),
+        ("max_fits = 30", dict(max_fits = 30)),
+    ]
+    print("sequential learning, Agrawal compositions: n_repl = {}, n_iter = {}".format(
+        n_repl, n_iter
+    ))
+    print("{0:>14} {1:>10} {2:>10} {3:>10} {4:>10}".format(
+        "stopping", "loop", "lockstep", "mean stop", "mean best"
+    ))
+    for name, stopping in cases:
+        t_loop, (history, stops) = timeit(
+            wu.sequentialLearningSimulator, X, Y, n_iter = n_iter, n_repl = n_repl,
+            vectorize = False, return_stops = True, **stopping
+        )
+        t_lock, (history_lock, stops_lock) = timeit(
+            wu.sequentialLearningSimulator, X, Y, n_iter = n_iter, n_repl = n_repl,
+            return_stops = True, **stopping
+        )
+        assert np.array_equal(history, history_lock)
+        assert np.array_equal(stops, stops_lock)
+        rules = dict(stopping, target = Y.max()) if "target" in stopping else stopping
+        assert np.array_equal(stops, early_stops_reference(history, Y, wu.N_INIT, **rules))
+        print("{0:>14} {1:9.2f}s {2:9.2f}s {3:10.1f} {4:10.1f}".format(
+            name, t_loop, t_lock, stops.mean(), Y[history].max(axis = 1).mean()
+        ))
+
+def bench_sweep(n_repl = 16, n_iter = 20, workers = (1, 2, 4, 8)):
+    """slSweep() on one shared pool vs. config-by-config simulator calls"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import Ridge
+
+    df = pd.read_csv(os.path.join("data", "agrawal_data.csv"))
+    X  = wu.formulas2df(df["chemical_formula"]).values
+    Y  = df["Fatigue Strength"].values
+    configs = wu.slGrid(
+        {"composition": X, "random": np.random.RandomState(101).random((len(Y), 1))},
+        {
+            "linear": LinearRegression(),
+            "ridge": Ridge(alpha = 1e-3),
+            "forest": RandomForestRegressor(n_estimators = 20, random_state = 0),
+        },
+        acquisition = ("greedy", "random"),
+    )
+    print("slSweep: {} configs x {} replications, n_iter = {}, {} cores".format(
+        len(configs), n_repl, n_iter, os.cpu_count()
+    ))
+    print("{0:>8} {1:>16} {2:>10}".format("workers", "config by config", "slSweep"))
+    for n_jobs in workers:
+        def by_config():
+            return {
+                config["name"]: wu.sequentialLearningSimulator(
+                    config["X"], Y, n_init = config["n_init"], n_iter = n_iter,
+                    n_repl = n_repl, model = config["estimator"],
+                    acquisition = config["acquisition"], n_jobs = n_jobs,
+                    vectorize = False
+                )
+                for config in configs
+            }
+        t_ref, ref = timeit(by_config)
+        t_new, (table, histories) = timeit(
+            wu.slSweep, configs, Y, n_iter = n_iter, n_repl = n_repl, n_jobs = n_jobs
+        )
+        assert all(np.array_equal(ref[name], histories[name]) for name in ref)
+        print("{0:>8} {1:15.2f}s {2:9.2f}s".format(n_jobs, t_ref, t_new))
+    print(table[["features", "model", "acquisition", "mean", "median", "frac_max"]])
+
+def bench_shared(sizes = (10000, 100000), n_features = 100, n_repl = 8, n_jobs = 2):
+    """Bytes sent per replication task, and wall time, with arrays vs.
+    SharedArray handles"""
+    from functools import partial
+
+    print("sequentialLearningSimulator(n_jobs = {}): arrays vs. SharedArray".format(n_jobs))
+    print("{0:>8} {1:>14} {2:>14} {3:>9} {4:>9}".format(
+        "n", "bytes/task", "shared", "arrays", "shared"
+    ))
+    rng   = np.random.default_rng(101)
+    model = wu.IncrementalLinearRegression()
+    for n in sizes:
+        X = rng.random((n, n_features))
+        Y = X @ rng.random(n_features)
+        with wu.SharedArray(X) as X_shared, wu.SharedArray(Y) as Y_shared:
+            task = lambda X, Y: len(pickle.dumps(partial(
+                wu._slReplication, X, Y, wu.N_INIT, 5, model, 1, wu.acquireGreedy
+            )))
+            t_arrays, h_arrays = timeit(
+                wu.sequentialLearningSimulator, X, Y, n_iter = 5, n_repl = n_repl,
+                model = model, n_jobs = n_jobs
+            )
+            t_shared, h_shared = timeit(
+                wu.sequentialLearningSimulator, X_shared, Y_shared, n_iter = 5,
+                n_repl = n_repl, model = model, n_jobs = n_jobs
+            )
+            assert np.array_equal(h_arrays, h_shared)
+            assert task(X_shared, Y_shared) < 1024
+            print("{0:8d} {1:14d} {2:14d} {3:8.2f}s {4:8.2f}s".format(
+                n, task(X, Y), task(X_shared, Y_shared), t_arrays, t_shared
+            ))
+
+# Non-dimensional error, as in the notebooks; module level so workers can unpickle it
+def nde(y_true, y_pred):
+    from sklearn.metrics import mean_squared_error
+    return np.sqrt(mean_squared_error(y_true, y_pred)) / np.std(y_true)
+
+def bench_cv(orders = (0, 1, 2, 3), n_cv = 5, workers = (1, 2, 4)):
+    """crossValidate() vs. the notebooks' per-model cross_validate() loop"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.metrics import make_scorer
+    from sklearn.model_selection import KFold, cross_validate
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+    nde_score = make_scorer(nde)
+
+    df = pd.read_csv(os.path.join("data", "agrawal_data.csv"))
+    X  = wu.formulas2df(df["chemical_formula"]).values
+    Y  = df["Fatigue Strength"].values
+    models = {
+        "linear": LinearRegression(),
+        "ridge": Ridge(alpha = 1e-3),
+        "forest": RandomForestRegressor(n_estimators = 20, random_state = 0),
+    }
+    preprocessors = {order: PolynomialFeatures(order) for order in orders}
+
+    def notebook():
+        scores = {}
+        for order in orders:
+            poly = PolynomialFeatures(order)
+            for name, reg in models.items():
+                scores[order, name] = cross_validate(
+                    reg, poly.fit_transform(X), Y, cv = n_cv,
+                    scoring = nde_score, return_train_score = True
+                )
+        return scores
+
+    print("cross validation, Agrawal compositions: {} orders x {} models x {} folds, {} cores".format(
+        len(orders), len(models), n_cv, os.cpu_count()
+    ))
+    t_ref, ref = timeit(notebook)
+    print("{0:>8} {1:>14} {2:>14}".format("workers", "cross_validate", "crossValidate"))
+    for n_jobs in workers:
+        with wu.SharedArray(X) as X_shared, wu.SharedArray(Y) as Y_shared:
+            t_new, table = timeit(
+                wu.crossValidate, models, X_shared, Y_shared, preprocessors,
+                cv = n_cv, scoring = nde_score, n_jobs = n_jobs
+            )
+        for (order, name), scores in ref.items():
+            rows = table[(table["preprocessor"] == order) & (table["model"] == name)]
+            assert np.allclose(rows["test_score"], scores["test_score"])
+            assert np.allclose(rows["train_score"], scores["train_score"])
+        print("{0:>8} {1:13.2f}s {2:13.2f}s".format(n_jobs, t_ref, t_new))
+    print(table.groupby(["preprocessor", "model"], sort = False)[["test_score", "train_score"]].mean())
+
+    ## Fitted preprocessing must not carry over to calls with other folds
+    scaled = {"scaled": StandardScaler()}
+    for seed in (None, 7):
+        table = wu.crossValidate({"linear": LinearRegression()}, X, Y, scaled, seed = seed)
+        scores = cross_validate(
+            make_pipeline(StandardScaler(), LinearRegression()), X, Y,
+            cv = KFold(n_cv, shuffle = seed is not None, random_state = seed)
+        )
+        assert np.allclose(table["test_score"], scores["test_score"])
+
+BENCHMARKS = {
+    "pifs2df": bench_pifs2df,
+    "stream": bench_stream,
+    "formulas": bench_formulas,
+    "composition": bench_composition,
+    "pool": bench_pool,
+    "incremental": bench_incremental,
+    "summary": bench_summary,
+    "cleaning": bench_cleaning,
+    "pif_writer": bench_pif_writer,
+    "upload": bench_upload,
+    "fetch": bench_fetch,
+    "frame_cache": bench_frame_cache,
+    "records": bench_records,
+    "flatten_parallel": bench_flatten_parallel,
+    "registry": bench_registry,
+    "surrogates": bench_surrogates,
+    "lockstep": bench_lockstep,
+    "early_stop": bench_early_stop,
+    "sweep": bench_sweep,
+    "shared": bench_shared,
+    "cv": bench_cv,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
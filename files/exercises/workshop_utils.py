@@ -1,16 +1,40 @@
+import hashlib
+import json
+import multiprocessing
 import numpy as np
 import os
 import pandas as pd
+import random
 import re
+import sklearn
+import tempfile
+import threading
 import matplotlib.pyplot as plt
 
+from pypif import pif
+from pypif.obj import ChemicalSystem, Composition, Property, Scalar
 from pypif_sdk.readview import ReadView
-from functools import reduce
-from sklearn.linear_model import LinearRegression
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from copy import deepcopy
+from functools import lru_cache, partial
+from itertools import product
+from multiprocessing import resource_tracker, shared_memory
+from scipy import sparse
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import KFold
+from sklearn.utils import check_random_state
+from time import monotonic, perf_counter, sleep
 
 # Set multiple functions' default value
 N_INIT = 20
 
+# Chemical formula token: element symbol followed by its amount
+_FORMULA_TOKEN = re.compile(r'([A-Za-z]+)([\d\.]+)')
+
 ## API Key Setup
 ##################################################
 # Automates loading a Citrination API key
@@ -53,17 +77,254 @@ def parsePifKey(pif, key):
     else:
         return np.nan
 
+# All scalars of a PIF from a single ReadView
+def _pifScalars(pif):
+    """Parse every key of a PIF for its first scalar value, building only one
+    ReadView; keys with no scalar map to nan (as in parsePifKey).
+    """
+    view   = ReadView(pif)
+    values = {}
+    for key in view.keys():
+        scalars = getattr(view[key], "scalars", None)
+        values[key] = scalars[0].value if scalars else np.nan
+
+    return values
+
+# (row, column, value) triplets of a collection of PIFs
+def _pifTriplets(pifs, keys = None, scalars = _pifScalars):
+    """Visit every PIF exactly once and record (row, column, value) triplets.
+    Each new key is assigned the next column index on first sight. If keys is
+    given, the columns are fixed to keys; other keys are dropped. scalars maps
+    one PIF (or record) to its {key: value} dict.
+
+    Returns
+        keys   = column names, in order of first appearance
+        rows   = row of each value; intp array
+        cols   = column of each value; intp array
+        values = list of values
+        n_pifs = number of PIFs visited
+    """
+    fixed   = keys is not None
+    columns = {key: ind for ind, key in enumerate(keys)} if fixed else {}
+    rows, cols, values = [], [], []
+    n_pifs = 0
+
+    for row, pif in enumerate(pifs):
+        for key, value in scalars(pif).items():
+            if fixed and key not in columns:
+                continue
+            rows.append(row)
+            cols.append(columns.setdefault(key, len(columns)))
+            values.append(value)
+        n_pifs = row + 1
+
+    return (
+        list(columns), np.asarray(rows, dtype = np.intp),
+        np.asarray(cols, dtype = np.intp), values, n_pifs
+    )
+
+# Sort a scalar into a column kind: 0 float, 1 int64, 2 anything else
+def _scalarKind(value):
+    kind = type(value)
+    if kind is float:
+        return 0
+    if kind is int:
+        return 1 if -2**63 <= value < 2**63 else 2
+    return 2
+
+# Scatter triplets into a DataFrame with one typed buffer per column
+def _frameTriplets(keys, rows, cols, values, n_rows):
+    """Build a DataFrame from (row, column, value) triplets, one buffer per
+    column. Columns holding only Python floats and ints are scattered into
+    float64 buffers, or int64 when every row has an int; the remaining
+    columns go through a nan-filled object buffer and infer_objects(), so
+    the dtypes match pandas' inference on the flat records.
+
+    Returns
+        df = Pandas DataFrame with len(keys) columns and n_rows rows
+    """
+    n_cols = len(keys)
+    kinds  = np.fromiter(map(_scalarKind, values), dtype = np.int8, count = len(values))
+    data   = np.empty(len(values), dtype = object)
+    data[:] = values
+
+    ## Per-column tallies decide the buffer type
+    counts  = np.bincount(cols, minlength = n_cols)
+    n_other = np.bincount(cols[kinds == 2], minlength = n_cols)
+    n_int   = np.bincount(cols[kinds == 1], minlength = n_cols)
+
+    ## Group triplets by column
+    order  = np.argsort(cols, kind = "stable")
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+
+    columns = {}
+    for j, key in enumerate(keys):
+        idx = order[bounds[j]:bounds[j + 1]]
+        if n_rows == 0 or n_other[j]:
+            buffer = np.full(n_rows, np.nan, dtype = object)
+            buffer[rows[idx]] = data[idx]
+            columns[key] = pd.Series(buffer).infer_objects()
+        elif n_int[j] == n_rows:
+            buffer = np.empty(n_rows, dtype = np.int64)
+            buffer[rows[idx]] = data[idx].astype(np.int64)
+            columns[key] = buffer
+        else:
+            buffer = np.full(n_rows, np.nan)
+            buffer[rows[idx]] = data[idx].astype(float)
+            columns[key] = buffer
+
+    return pd.DataFrame(columns, index = pd.RangeIndex(n_rows), columns = keys)
+
+# Flattening engine for pifs2df()
+def _flattenPifs(pifs, keys = None, scalars = _pifScalars):
+    """Flatten PIFs into a DataFrame in a single pass; see _pifTriplets()
+    for the arguments and _frameTriplets() for the column dtypes.
+
+    Returns
+        df = Pandas DataFrame, columns in order of first appearance
+    """
+    keys, rows, cols, values, n_pifs = _pifTriplets(pifs, keys, scalars)
+
+    return _frameTriplets(keys, rows, cols, values, n_pifs)
+
+# PIFs shared with forked workers of _pifTripletsParallel()
+_SHARED_PIFS = None
+
+def _sharedPifTriplets(bounds):
+    return _pifTriplets(_SHARED_PIFS[bounds[0]:bounds[1]])
+
+# Multi-process triplets of a collection of PIFs
+def _pifTripletsParallel(pifs, n_jobs = -1, executor = None, n_shards = None):
+    """Shard the PIFs into contiguous slices, record each shard's triplets in
+    a worker process, and merge them in shard order; returns the same as
+    _pifTriplets(), with the same first-appearance column order.
+
+    Pickling PIF objects costs about as much as flattening them, so when the
+    pool forks its workers, they read the PIFs from the parent's memory and
+    only slice bounds are sent. Workers send back only their keys and
+    triplets, not nan-padded frames.
+    """
+    global _SHARED_PIFS
+    pifs = list(pifs)
+    n_workers = os.cpu_count() if n_jobs == -1 or executor is not None else n_jobs
+    n_shards  = n_shards or 4 * n_workers
+    bounds    = np.linspace(0, len(pifs), n_shards + 1).astype(int)
+    bounds    = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    ## Platform default (listed first) if unset; reading it must not fix it
+    start_method = multiprocessing.get_start_method(allow_none = True) \
+        or multiprocessing.get_all_start_methods()[0]
+
+    if executor is not None:
+        parts = list(executor.map(_pifTriplets, [pifs[a:b] for a, b in bounds]))
+    elif start_method == "fork":
+        _SHARED_PIFS = pifs
+        try:
+            with ProcessPoolExecutor(
+                    max_workers = n_workers,
+                    mp_context = multiprocessing.get_context("fork")
+                ) as pool:
+                parts = list(pool.map(_sharedPifTriplets, bounds))
+        finally:
+            _SHARED_PIFS = None
+    else:
+        with ProcessPoolExecutor(max_workers = n_workers) as pool:
+            parts = list(pool.map(_pifTriplets, [pifs[a:b] for a, b in bounds]))
+
+    ## Union the schemas in shard order; remap each shard's columns
+    columns = {}
+    all_rows, all_cols, all_values = [], [], []
+    offset = 0
+    for keys, rows, cols, values, n_pifs in parts:
+        remap = np.array(
+            [columns.setdefault(key, len(columns)) for key in keys], dtype = np.intp
+        )
+        all_rows.append(rows + offset)
+        all_cols.append(remap[cols])
+        all_values.extend(values)
+        offset += n_pifs
+
+    rows = np.concatenate(all_rows) if all_rows else np.empty(0, dtype = np.intp)
+    cols = np.concatenate(all_cols) if all_cols else np.empty(0, dtype = np.intp)
+
+    return list(columns), rows, cols, all_values, offset
+
+# Stable column indices
+class SchemaRegistry:
+    """Assigns stable integer indices to column names (PIF keys, elements),
+    in order of registration. Indices never change once assigned, so frames
+    and arrays written against the same registry line up across batches and
+    runs without reindexing. If path is given, the registry is loaded from it
+    when it exists, and saved to it whenever it grows.
+
+    Usage
+        keys = SchemaRegistry("schema/pif_keys.json")
+        df   = pifs2df(pifs, registry = keys)
+        ind  = keys.indices(["Density", "Band Gap"])
+    """
+    def __init__(self, path = None, names = ()):
+        self.path   = path
+        self._index = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                self._index = {name: ind for ind, name in enumerate(json.load(f))}
+        self.indices(names)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    @property
+    def names(self):
+        """Registered names, in index order"""
+        return list(self._index)
+
+    def indices(self, names):
+        """Indices of names as an intp array, registering any new names"""
+        n_known = len(self._index)
+        indices = np.fromiter(
+            (self._index.setdefault(name, len(self._index)) for name in names),
+            dtype = np.intp
+        )
+        if self.path is not None and len(self._index) > n_known:
+            self.save()
+        return indices
+
+    def save(self, path = None):
+        """Write the names, in index order, to a JSON file"""
+        path = path or self.path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok = True)
+        fd, tmp = tempfile.mkstemp(dir = folder, suffix = ".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.names, f)
+        os.replace(tmp, path)
+
 # Flatten a collection of PIFs
-def pifs2df(pifs):
+def pifs2df(pifs, n_jobs = 1, executor = None, registry = None):
     """Converts a collection of PIFs to tabular data
     Very simple, purpose-built utility script. Converts an iterable of PIFs
-    to a dataframe. Returns the superset of all PIF keys as the set of columns.
-    Non-scalar values are converted to nan.
+    to a dataframe. Returns the superset of all PIF keys as the set of columns,
+    in order of first appearance. Non-scalar values are converted to nan.
+    Every PIF is visited exactly once. For large collections, the PIFs can be
+    sharded across worker processes; the result is identical. With a
+    SchemaRegistry, the columns are instead every key in the registry, in
+    index order, and new keys are registered.
 
     Usage
         df = pifs2df(pifs)
+        df = pifs2df(pifs, n_jobs = 8)
+        df = pifs2df(pifs, registry = SchemaRegistry("pif_keys.json"))
     Arguments
-        pifs = an iterable of PIFs
+        pifs     = an iterable of PIFs
+        n_jobs   = number of worker processes; -1 uses every core
+        executor = optional Executor to map the shards over, in place of n_jobs
+        registry = optional SchemaRegistry fixing the column order
     Returns
         df = Pandas DataFrame
 
@@ -92,28 +353,407 @@ def pifs2df(pifs):
         ## Rectangularize the pifs
         df = pifs2df(pifs)
     """
-    ## Consolidate superset of keys
-    key_sets = [set(ReadView(pif).keys()) for pif in pifs]
-    keys_ref = reduce(
-        lambda s1, s2: s1.union(s2),
-        key_sets
-    )
+    ## Single pass over the PIFs; one ReadView per PIF
+    if n_jobs == 1 and executor is None:
+        keys, rows, cols, values, n_pifs = _pifTriplets(pifs)
+    else:
+        keys, rows, cols, values, n_pifs = _pifTripletsParallel(pifs, n_jobs, executor)
+
+    ## Scatter, onto the registry's columns if given
+    if registry is not None:
+        cols = registry.indices(keys)[cols]
+        keys = registry.names
 
     ## Rectangularize
-    ## TODO: Append dataframes, rather than using a comprehension
-    df_data = \
-        pd.DataFrame(
-            columns = keys_ref,
-            data = [
-                [
-                    parsePifKey(pif, key) \
-                    for key in keys_ref
-                ] for pif in pifs
-            ]
-        )
+    df_data = _frameTriplets(keys, rows, cols, values, n_pifs)
 
     return df_data
 
+# Iterate over a JSON array on disk
+def _iterJsonArray(fpath, block_size = 2**16):
+    """Yield the elements of a top-level JSON array one at a time. The file is
+    read in blocks and decoded incrementally, so only the current element (and
+    at most one block) is held in memory. Elements must be separated by
+    exactly one comma; anything else raises ValueError.
+    """
+    decoder = json.JSONDecoder()
+    with open(fpath, "r") as f:
+        buf, pos, eof = "", 0, False
+
+        def peek():
+            ## Skip whitespace, reading blocks as needed; "" at the end of file
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos:pos + 1]
+                buf, pos = f.read(block_size), 0
+                eof = not buf
+
+        if peek() != "[":
+            raise ValueError("{} does not contain a JSON array".format(fpath))
+        pos += 1
+
+        while peek() != "]":
+            if peek() in ("", ","):
+                raise ValueError("Missing element in JSON array in {}".format(fpath))
+            ## Decode the next element, reading more if it is incomplete
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buf, pos)
+                    if not eof and (end == len(buf) or buf[end] not in " \t\r\n,]"):
+                        raise ValueError  # a number cut at the block edge, e.g. "1." of "1.5"
+                    break
+                except ValueError:
+                    if eof:
+                        raise ValueError("Truncated JSON array in {}".format(fpath))
+                    block = f.read(max(block_size, len(buf) - pos))
+                    eof   = not block
+                    buf, pos = buf[pos:] + block, 0
+
+            yield element
+            pos = end
+
+            ## Exactly one comma before the next element
+            separator = peek()
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError("Expected ',' or ']' in JSON array in {}".format(fpath))
+            pos += 1
+            if peek() == "]":
+                raise ValueError("Trailing comma in JSON array in {}".format(fpath))
+
+        pos += 1
+        if peek():
+            raise ValueError("Data after the JSON array in {}".format(fpath))
+
+# Columns and dtypes of a PIF JSON file
+def _scanPifSchema(fpath):
+    """Stream through a PIF JSON file and return the dtype of each key, in
+    order of first appearance, as pifs2df() would infer it for the whole
+    file: from the types of the values seen, and nan where a PIF lacks the key.
+    """
+    types, counts, n_pifs = {}, {}, 0
+    for record in _iterJsonArray(fpath):
+        for key, value in _pifScalars(pif.loado(record)).items():
+            types.setdefault(key, {}).setdefault(type(value), value)
+            counts[key] = counts.get(key, 0) + 1
+        n_pifs += 1
+
+    dtypes = {}
+    for key, samples in types.items():
+        values = list(samples.values()) + ([np.nan] if counts[key] < n_pifs else [])
+        dtypes[key] = pd.Series(values, dtype = object).infer_objects().dtype
+
+    return dtypes
+
+# Stream a PIF JSON file into DataFrame chunks
+def streamPifs2df(fpath, chunksize = 10000, columns = None, dtypes = None):
+    """Converts a PIF JSON file to tabular data, chunk by chunk
+    Streaming counterpart to pifs2df() for files too large to load with
+    json.load(). Records are parsed one at a time, and DataFrames of at most
+    chunksize rows are yielded. Every chunk has the same columns and dtypes:
+    the superset of all PIF keys in the file, typed as pifs2df() would type
+    the whole file. Both are found by a first streaming pass over the file,
+    which is skipped when columns and dtypes are given.
+
+    Usage
+        for df in streamPifs2df(fpath):
+            ...
+    Arguments
+        fpath     = path to a JSON file holding an array of PIFs
+        chunksize = maximum number of rows per chunk; integer
+        columns   = optional list of keys to use as the columns; keys not
+                    listed are dropped
+        dtypes    = optional dict of column dtypes; with columns, skips the
+                    first pass
+    Returns
+        generator of Pandas DataFrames
+    """
+    if columns is None or dtypes is None:
+        schema = _scanPifSchema(fpath)
+        if columns is None:
+            columns = list(schema)
+        ## Keys absent from the file are all nan
+        dtypes = dict(
+            {key: schema.get(key, np.dtype(float)) for key in columns},
+            **(dtypes or {})
+        )
+    columns = list(columns)
+
+    def frame(chunk):
+        df = _flattenPifs(chunk, keys = columns)
+        return df.astype({key: dtypes[key] for key in df.columns if key in dtypes})
+
+    chunk = []
+    for record in _iterJsonArray(fpath):
+        chunk.append(pif.loado(record))
+        if len(chunk) == chunksize:
+            yield frame(chunk)
+            chunk = []
+
+    if chunk:
+        yield frame(chunk)
+
+# Cache key of a PIF search
+def _queryKey(query, page_size):
+    """Hash a PIF search query, ignoring its paging (from/size)."""
+    spec = query.as_dictionary() if hasattr(query, "as_dictionary") else vars(query)
+    spec = {k: v for k, v in spec.items() if k not in ("from", "size")}
+    return hashlib.sha256(
+        json.dumps([spec, page_size], sort_keys = True, default = str).encode()
+    ).hexdigest()[:32]
+
+# Cache key of a file's contents
+def _fileKey(fpath, block_size = 2**20):
+    """Hash the contents of a file, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+# Content hash, memoized on the file's path, size and modification time
+@lru_cache(maxsize = 256)
+def _fileKeyCached(fpath, size, mtime_ns):
+    return _fileKey(fpath)
+
+# Fetch all pages of a PIF search, with a local cache
+def fetchPifs(client, query, page_size = 500, max_workers = 4,
+              cache_dir = ".pif_cache", refresh = False):
+    """Run a PIF search to completion, paging concurrently
+    Companion to pifs2df() for result sets larger than one page. The first
+    page gives the total number of hits; the remaining pages are requested
+    over a bounded thread pool, each retried with backoff. Pages are saved
+    under cache_dir in a folder keyed by a hash of the query, so reruns (e.g.
+    after a kernel restart) are served from disk without contacting the
+    server.
+
+    Usage
+        pifs = fetchPifs(client.search, query)
+        df   = pifs2df(pifs)
+    Arguments
+        client      = object with a pif_search(query) method, e.g.
+                      CitrinationClient(...).search
+        query       = PifSystemReturningQuery; its size and from_index are
+                      overridden page by page
+        page_size   = hits per request; integer
+        max_workers = maximum concurrent requests; integer
+        cache_dir   = directory for cached pages; None disables the cache
+        refresh     = ignore cached pages and refetch; boolean
+    Returns
+        pifs = list of PIF systems, in search order
+    """
+    ## Cache key: the query without its paging
+    key    = _queryKey(query, page_size)
+    folder = None if cache_dir is None else os.path.join(cache_dir, key)
+    if folder is not None:
+        os.makedirs(folder, exist_ok = True)
+
+    def fetchPage(ind_page):
+        path = None if folder is None else \
+            os.path.join(folder, "page{:05d}.json".format(ind_page))
+        if path is not None and not refresh and os.path.exists(path):
+            with open(path, "r") as f:
+                page = json.load(f)
+        else:
+            page_query = deepcopy(query)
+            page_query.from_index = ind_page * page_size
+            page_query.size       = page_size
+            result = retry_with_backoff(lambda: client.pif_search(page_query))
+            page = {
+                "total_num_hits": result.total_num_hits,
+                "systems": json.loads(pif.dumps([hit.system for hit in result.hits])),
+            }
+            if path is not None:
+                tmp = path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(page, f)
+                os.replace(tmp, path)
+        return page
+
+    ## First page gives the total; fetch the rest concurrently
+    first   = fetchPage(0)
+    n_pages = max(1, -(-first["total_num_hits"] // page_size))
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        pages = [first] + list(pool.map(fetchPage, range(1, n_pages)))
+
+    return pif.loado([system for page in pages for system in page["systems"]])
+
+# Flatten PIFs once, then load the table from a columnar cache
+def cachedPifs2df(source, columns = None, client = None,
+                  cache_dir = ".pif_cache", refresh = False, **fetch_kwargs):
+    """Converts PIFs to tabular data, caching the result on disk
+    The first call flattens the PIFs as pifs2df() does and saves the table in
+    Feather (Arrow IPC) format under cache_dir, keyed by a hash of the source
+    file's contents (rehashed only when the file changes) or of the query.
+    Later calls memory-map the cached file
+    and materialize only the requested columns, skipping JSON parsing and
+    ReadView altogether. Requires pyarrow.
+
+    Usage
+        df = cachedPifs2df("data/pifs.json")
+        df = cachedPifs2df(query, client = client.search)
+        df = cachedPifs2df("data/pifs.json", columns = ["Band Gap", "Density"])
+    Arguments
+        source       = path to a JSON file holding an array of PIFs, or a
+                       PifSystemReturningQuery if client is given
+        columns      = optional list of columns to load; default all
+        client       = search client passed to fetchPifs() when source is a
+                       query
+        cache_dir    = directory for cached tables
+        refresh      = ignore the cached table and rebuild it; boolean
+        fetch_kwargs = further arguments to fetchPifs(), e.g. page_size
+    Returns
+        df = Pandas DataFrame
+
+    Note: columns mixing strings and numbers are stored as strings.
+    """
+    try:
+        from pyarrow import feather
+    except ImportError:
+        raise ImportError(
+            "cachedPifs2df() requires pyarrow; install it with `pip install pyarrow`"
+        )
+
+    if client is None:
+        stat = os.stat(source)
+        key  = _fileKeyCached(os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+    else:
+        key = _queryKey(source, fetch_kwargs.get("page_size", 500))
+    path = os.path.join(cache_dir, "frames", key + ".feather")
+
+    ## Warm: memory-map the cached table, reading only the needed columns
+    if not refresh and os.path.exists(path):
+        table = feather.read_table(path, columns = columns, memory_map = True)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas()
+
+    ## Cold: flatten the PIFs and save the table
+    if client is None:
+        df = pd.concat(streamPifs2df(source), ignore_index = True)
+    else:
+        df = pifs2df(fetchPifs(client, source, cache_dir = cache_dir,
+                               refresh = refresh, **fetch_kwargs))
+    stored = df.copy()
+    ## Arrow columns hold one type
+    for name in stored.columns[stored.dtypes == object]:
+        mask = stored[name].notna()
+        stored[name] = stored[name].where(~mask, stored[name][mask].astype(str))
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp = path + ".tmp"
+    feather.write_feather(stored, tmp, compression = "uncompressed")
+    os.replace(tmp, path)
+
+    return stored if columns is None else stored[list(columns)]
+
+# Compact PIF record
+class PifRecord:
+    """Slim, read-only summary of a PIF system for bulk processing: its uid,
+    chemical formula, and the first scalar value of each top-level property.
+    Records are built straight from raw PIF dicts (e.g. json.load() output)
+    without pypif objects or ReadView. Property names are interned, so records
+    sharing a layout share one names tuple.
+
+    Usage
+        records = [PifRecord.from_dict(d) for d in json.load(f)]
+        records = loadPifRecords(fpath)
+        df      = records2df(records)
+    """
+    __slots__ = ("uid", "formula", "names", "values")
+
+    # Shared property-name tuples, keyed by themselves
+    _layouts = {}
+
+    def __init__(self, uid, formula, names, values):
+        self.uid     = uid
+        self.formula = formula
+        self.names   = PifRecord._layouts.setdefault(names, names)
+        self.values  = values
+
+    @classmethod
+    def from_dict(cls, record):
+        """Build a record from a raw PIF dict. As in ReadView, properties with
+        no name are skipped, and a name used by properties that differ is
+        dropped as ambiguous. Properties with no scalar map to nan.
+        """
+        scalars, ambiguous, seen = {}, set(), {}
+        for prop in record.get("properties") or ():
+            name = prop.get("name")
+            if not name or name in ambiguous:
+                continue
+            if name in seen:
+                if seen[name] != prop:
+                    ambiguous.add(name)
+                    del scalars[name]
+                continue
+            seen[name] = prop
+            first = prop.get("scalars")
+            if isinstance(first, list):
+                first = first[0] if first else None
+            if isinstance(first, dict):
+                first = first.get("value")
+            scalars[name] = np.nan if first is None else first
+
+        return cls(
+            record.get("uid"), record.get("chemicalFormula"),
+            tuple(scalars), tuple(scalars.values())
+        )
+
+    def to_dict(self):
+        return dict(zip(self.names, self.values))
+
+    def __getitem__(self, name):
+        return self.values[self.names.index(name)]
+
+    def __repr__(self):
+        return "PifRecord(uid={!r}, formula={!r}, {} properties)".format(
+            self.uid, self.formula, len(self.names)
+        )
+
+# Stream a PIF JSON file into compact records
+def loadPifRecords(fpath):
+    """Read a PIF JSON file into a list of PifRecord, one element at a time
+    Usage
+        records = loadPifRecords(fpath)
+    Arguments
+        fpath = path to a JSON file holding an array of PIFs
+    Returns
+        records = list of PifRecord
+    """
+    return [PifRecord.from_dict(record) for record in _iterJsonArray(fpath)]
+
+# Flatten compact records
+def records2df(records, columns = None):
+    """Converts PifRecords to tabular data
+    Counterpart to pifs2df() for PifRecord: one column per property name, in
+    order of first appearance, with the first scalar value or nan. For PIFs
+    whose keys are all top-level properties, the result equals pifs2df().
+
+    Usage
+        df = records2df(records)
+    Arguments
+        records = an iterable of PifRecord
+        columns = optional list of property names to use as the columns
+    Returns
+        df = Pandas DataFrame
+    """
+    return _flattenPifs(records, keys = columns, scalars = PifRecord.to_dict)
+
+# Tokenize a formula, cached on the formula string
+@lru_cache(maxsize = 2**16)
+def _parseFormulaCached(formula):
+    """Single pass of the compiled tokenizer over a formula string; returns a
+    tuple of (element, fraction) pairs. Repeated elements keep the last value.
+    """
+    return tuple(dict(
+        (element, float(amount)) \
+        for element, amount in _FORMULA_TOKEN.findall(formula)
+    ).items())
+
 # Formula to dict
 def parse_formula(formula):
     """Parse a formula string
@@ -124,109 +764,1198 @@ def parse_formula(formula):
     Returns
         d = python dict of element keys and compositional fractions
     """
-    composition = dict(map(
-        lambda s: (
-            re.search(r'\D+', s).group(),
-            float(re.search(r'[\d\.]+', s).group())
-        ),
-        re.findall(
-            r'\w+[\d\.]+',
-            formula
-            #ReadView(pifs[0]).chemical_formula
+    return dict(_parseFormulaCached(formula))
+
+# Batch formula parsing
+def parse_formulas(formulas):
+    """Parse an array of formula strings into a composition matrix
+    Each distinct formula is tokenized once, and repeats are served from an
+    LRU cache shared across calls.
+
+    Usage
+        X, elements = parse_formulas(formulas)
+    Arguments
+        formulas = chemical formulas; iterable of strings
+    Returns
+        X        = composition fractions; numpy array of shape
+                   (n_formulas, n_elements), zero where an element is absent
+        elements = element symbols for the columns of X; sorted list
+    """
+    ## Deduplicate, remembering each formula's position
+    unique  = {}
+    inverse = np.fromiter(
+        (unique.setdefault(formula, len(unique)) for formula in formulas),
+        dtype = np.intp
+    )
+    compositions = [_parseFormulaCached(formula) for formula in unique]
+
+    ## Element index
+    elements = sorted({element for comp in compositions for element, _ in comp})
+    index    = {element: ind for ind, element in enumerate(elements)}
+
+    ## Fill the distinct rows, then gather
+    X_unique = np.zeros((len(compositions), len(elements)))
+    for ind, comp in enumerate(compositions):
+        for element, fraction in comp:
+            X_unique[ind, index[element]] = fraction
+
+    return X_unique[inverse], elements
+
+# Composition matrix builder
+class CompositionMatrix:
+    """Accumulates compositions as (row, element, fraction) triplets, and emits
+    them as a dense array, a DataFrame or a scipy.sparse CSR matrix. Columns
+    are the sorted superset of elements; absent elements are zero. Given a
+    SchemaRegistry, the columns are instead every element in the registry, in
+    index order, and new elements are registered.
+
+    Usage
+        comp = CompositionMatrix.from_formulas(formulas)
+        df   = comp.to_frame()
+        X    = comp.to_csr()
+        X    = comp.to_array(registry = elements, out = X_all[start:stop])
+    """
+    def __init__(self):
+        self.n_rows  = 0
+        self._index  = {}  # element -> column, in order of first appearance
+        self._rows   = []
+        self._cols   = []
+        self._values = []
+
+    @classmethod
+    def from_formulas(cls, formulas):
+        """Build a composition matrix from an iterable of formula strings"""
+        comp = cls()
+        for formula in formulas:
+            comp.add(_parseFormulaCached(formula))
+        return comp
+
+    def add(self, composition):
+        """Append one row from an iterable of (element, fraction) pairs, or a
+        dict of element keys and fractions
+        """
+        if isinstance(composition, dict):
+            composition = composition.items()
+        for element, fraction in composition:
+            self._rows.append(self.n_rows)
+            self._cols.append(self._index.setdefault(element, len(self._index)))
+            self._values.append(fraction)
+        self.n_rows += 1
+
+    @property
+    def elements(self):
+        """Sorted element symbols labelling the columns"""
+        return sorted(self._index)
+
+    def _columns(self, registry):
+        return self.elements if registry is None else registry.names
+
+    def _triplets(self, registry = None):
+        ## Remap first-appearance columns onto sorted or registry order
+        if registry is None:
+            order = np.empty(len(self._index), dtype = np.intp)
+            order[[self._index[element] for element in self.elements]] = \
+                np.arange(len(self._index))
+        else:
+            order = registry.indices(self._index)
+        return (
+            np.asarray(self._rows, dtype = np.intp),
+            order[np.asarray(self._cols, dtype = np.intp)],
+            np.asarray(self._values, dtype = float)
+        )
+
+    def to_array(self, registry = None, out = None):
+        """Dense numpy array of shape (n_rows, n_elements). If out is given,
+        the rows are written into it (zeroed first) and it is returned; it
+        needs n_rows rows and at least n_elements columns.
+        """
+        rows, cols, values = self._triplets(registry)
+        n_cols = len(self._columns(registry))
+        if out is None:
+            X = np.zeros((self.n_rows, n_cols))
+        else:
+            if out.shape[0] != self.n_rows or out.shape[1] < n_cols:
+                raise ValueError("out has shape {}, need ({}, >= {})".format(
+                    out.shape, self.n_rows, n_cols
+                ))
+            X = out
+            X[...] = 0
+        X[rows, cols] = values
+        return X
+
+    def to_frame(self, registry = None):
+        """Dense DataFrame with element columns"""
+        X = self.to_array(registry)  # registers new elements first
+        return pd.DataFrame(columns = self._columns(registry), data = X)
+
+    def to_csr(self, registry = None):
+        """scipy.sparse CSR matrix of shape (n_rows, n_elements)"""
+        rows, cols, values = self._triplets(registry)
+        return sparse.csr_matrix(
+            (values, (rows, cols)),
+            shape = (self.n_rows, len(self._columns(registry)))
         )
-    ))
-    return composition
 
 # Parse formulas, return a DataFrame
-def formulas2df(formulas):
+def formulas2df(formulas, registry = None):
     """Convert an iterable of formulas to a DataFrame
     Usage
         df = formulas2df(formulas)
+        df = formulas2df(formulas, registry = SchemaRegistry("elements.json"))
     Arguments
         formulas = chemical formulas; iterable of strings
+        registry = optional SchemaRegistry fixing the column order; columns
+                   are every registered element, in index order
     Returns
         df = DataFrame of chemical compositions; keys are elements, entries are
              composition fractions
+
+    Use CompositionMatrix.from_formulas(formulas).to_csr() for a sparse matrix.
     """
+    return CompositionMatrix.from_formulas(formulas).to_frame(registry)
 
-    # Parse all the formulas
-    all_compositions = [
-        parse_formula(formula) \
-        for formula in formulas
-    ]
-    all_formulas = [set(d.keys()) for d in all_compositions]
+## Sequential Learning Simulator
+##################################################
+class IncrementalLinearRegression(BaseEstimator, RegressorMixin):
+    """Least-squares (or ridge) regression with rank-one updates
+
+    Keeps the centered scatter matrix S, the cross term s_xy, an orthonormal
+    basis Q of the column space of S and the inverse P = (Q' S Q + alpha I)^-1
+    as sufficient statistics. Each row passed to update() is a Welford update
+    of S; a row within the span of Q is a Sherman-Morrison update of P, so
+    adding a point costs O(d^2) rather than an O(n d^2) refit. A row with a
+    new direction (relative size above rtol) extends Q and reinverts P, which
+    happens at most d times.
+
+    The coefficients Q P Q' s_xy are the minimum-norm least-squares solution,
+    as from LinearRegression, so fewer rows than features and exactly
+    collinear features (e.g. compositions from formulas2df(), which sum to
+    one) need no refit: the updates run in the subspace the data spans.
+
+    predict(X, return_std = True) also returns the standard error of the
+    fitted mean, sigma * sqrt(1/n + x' P x) with sigma estimated from the
+    residuals, so the model can drive acquireUCB().
+
+    :param alpha: Ridge penalty on the coefficients
+    :type alpha: float
+    :param fit_intercept: Whether to fit an intercept
+    :type fit_intercept: boolean
+    :param rtol: Relative size of a row's component outside the span of the
+        rows so far, below which it adds no new direction
+    :type rtol: float
+    """
+    def __init__(self, alpha = 0.0, fit_intercept = True, rtol = 1e-8):
+        self.alpha         = alpha
+        self.fit_intercept = fit_intercept
+        self.rtol          = rtol
+
+    def fit(self, X, y):
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        y = np.asarray(y, dtype = float)
+        d = X.shape[1]
+
+        self.n_     = 0
+        self.mean_  = np.zeros(d)
+        self.ymean_ = 0.0
+        self.S_     = np.zeros((d, d))
+        self.sxy_   = np.zeros(d)
+        self.syy_   = 0.0
+        self.Q_     = np.zeros((d, 0))
+        self.P_     = np.zeros((0, 0))
+
+        return self.update(X, y)
+
+    def update(self, X, y):
+        """Add rows to the fit"""
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        y = np.atleast_1d(np.asarray(y, dtype = float))
+
+        for x, yi in zip(X, y):
+            ## Welford update of the statistics
+            if self.fit_intercept:
+                c  = self.n_ / (self.n_ + 1)
+                dx = x - self.mean_
+                dy = yi - self.ymean_
+                self.mean_  += dx / (self.n_ + 1)
+                self.ymean_ += dy / (self.n_ + 1)
+            else:
+                c, dx, dy = 1.0, x, yi
+            self.S_   += c * np.outer(dx, dx)
+            self.sxy_ += c * dx * dy
+            self.syy_ += c * dy * dy
+            self.n_   += 1
+
+            u    = np.sqrt(c) * dx
+            norm = np.linalg.norm(u)
+            if norm == 0:
+                continue
+
+            ## New direction: extend the basis (Gram-Schmidt, twice) and reinvert
+            w = u - self.Q_ @ (self.Q_.T @ u)
+            w = w - self.Q_ @ (self.Q_.T @ w)
+            if np.linalg.norm(w) > self.rtol * norm and self.Q_.shape[1] < len(u):
+                self.Q_ = np.column_stack([self.Q_, w / np.linalg.norm(w)])
+                self.P_ = np.linalg.inv(
+                    self.Q_.T @ self.S_ @ self.Q_ + self.alpha * np.eye(self.Q_.shape[1])
+                )
+                continue
+
+            ## Sherman-Morrison update of the inverse within the span
+            Pu = self.P_ @ (self.Q_.T @ u)
+            self.P_ -= np.outer(Pu, Pu) / (1 + (self.Q_.T @ u) @ Pu)
+
+        self.coef_      = self.Q_ @ (self.P_ @ (self.Q_.T @ self.sxy_))
+        self.intercept_ = self.ymean_ - self.mean_ @ self.coef_ if self.fit_intercept else 0.0
+        return self
+
+    def predict(self, X, return_std = False):
+        X      = np.asarray(X, dtype = float)
+        Y_mean = X @ self.coef_ + self.intercept_
+        if not return_std:
+            return Y_mean
+
+        ## Residual variance from the centered statistics
+        r   = self.Q_.shape[1]
+        sse = self.syy_ - 2 * self.coef_ @ self.sxy_ + self.coef_ @ self.S_ @ self.coef_
+        dof = max(self.n_ - r - int(self.fit_intercept), 1)
+        Xc  = X - self.mean_ if self.fit_intercept else X
+        Z   = Xc @ self.Q_
+        var = np.einsum("ij,jk,ik->i", Z, self.P_, Z)
+        if self.alpha > 0:
+            ## (S + alpha I)^-1 is 1 / alpha off the span of the data
+            var += (np.einsum("ij,ij->i", Xc, Xc) - np.einsum("ij,ij->i", Z, Z)) / self.alpha
+        if self.fit_intercept:
+            var += 1 / self.n_
+        return Y_mean, np.sqrt(max(sse, 0.0) / dof * np.maximum(var, 0.0))
+
+# Surrogate models with warm starts
+class Surrogate(BaseEstimator, RegressorMixin):
+    """Base class for sequential learning surrogates
+
+    A surrogate is fit once on the initial candidates with fit(), then given
+    each newly acquired batch with update(), which may reuse state from the
+    previous round instead of refitting from scratch. The surrogate keeps the
+    training rows itself (X_, y_), so update() only needs the new rows.
+    sequentialLearningSimulator() calls update() on any model that has one.
+
+    Subclasses implement _fit(warm) and predict(X, return_std = False).
+    """
+    def fit(self, X, y):
+        self.X_ = np.atleast_2d(np.asarray(X, dtype = float))
+        self.y_ = np.asarray(y, dtype = float)
+        self.n_updates_ = 0
+        self._fit(warm = False)
+        return self
+
+    def update(self, X, y):
+        """Add rows to the fit"""
+        self.X_ = np.vstack([self.X_, np.atleast_2d(np.asarray(X, dtype = float))])
+        self.y_ = np.concatenate([self.y_, np.atleast_1d(np.asarray(y, dtype = float))])
+        self.n_updates_ += 1
+        self._fit(warm = True)
+        return self
+
+    def _fit(self, warm):
+        raise NotImplementedError
+
+    def predict(self, X, return_std = False):
+        raise NotImplementedError
+
+class ForestSurrogate(Surrogate):
+    """Random forest that grows on each update
+
+    Each update fits n_grow new trees on all the data so far and keeps the
+    newest n_estimators, so older trees (fit on less data) age out instead
+    of the whole forest being refit. The std is the spread of the trees'
+    predictions. Each update reseeds the forest from a generator owned by
+    the surrogate, so new trees never repeat the seeds of earlier ones.
+
+    :param estimator: Template forest; default RandomForestRegressor()
+    :type estimator: RandomForestRegressor
+    :param n_grow: Trees added per update
+    :type n_grow: integer
+    """
+    def __init__(self, estimator = None, n_grow = 10):
+        self.estimator = estimator
+        self.n_grow    = n_grow
+
+    def _fit(self, warm):
+        if not warm:
+            self.estimator_ = clone(
+                self.estimator if self.estimator is not None else RandomForestRegressor()
+            ).set_params(warm_start = True)
+            self.n_keep_ = self.estimator_.n_estimators
+            self.random_state_ = check_random_state(self.estimator_.random_state)
+            self.estimator_.fit(self.X_, self.y_)
+            return
+        ## With a fixed random_state, sklearn skips len(estimators_) draws
+        ## before seeding new trees; that count stays at n_keep_ once the
+        ## forest is trimmed, so every update would reuse the same seeds
+        forest = self.estimator_
+        forest.set_params(
+            n_estimators = len(forest.estimators_) + self.n_grow,
+            random_state = self.random_state_.randint(np.iinfo(np.int32).max),
+        )
+        forest.fit(self.X_, self.y_)
+        forest.estimators_ = forest.estimators_[-self.n_keep_:]
+        forest.set_params(n_estimators = len(forest.estimators_))
+
+    def predict(self, X, return_std = False):
+        X = np.asarray(X, dtype = float)
+        if not return_std:
+            return self.estimator_.predict(X)
+        Y_trees = np.stack([tree.predict(X) for tree in self.estimator_.estimators_])
+        return Y_trees.mean(axis = 0), Y_trees.std(axis = 0)
+
+class BoostingSurrogate(Surrogate):
+    """Gradient boosting that adds stages on each update
+
+    Each update fits n_grow further stages to the residuals on all the data
+    so far, keeping the existing stages. Provides no std;
+    predict(X, return_std = True) raises ValueError.
+
+    :param estimator: Template model; default GradientBoostingRegressor()
+    :type estimator: GradientBoostingRegressor
+    :param n_grow: Stages added per update
+    :type n_grow: integer
+    """
+    def __init__(self, estimator = None, n_grow = 10):
+        self.estimator = estimator
+        self.n_grow    = n_grow
+
+    def _fit(self, warm):
+        if not warm:
+            self.estimator_ = clone(
+                self.estimator if self.estimator is not None else GradientBoostingRegressor()
+            ).set_params(warm_start = True)
+        else:
+            self.estimator_.set_params(
+                n_estimators = self.estimator_.n_estimators_ + self.n_grow
+            )
+        self.estimator_.fit(self.X_, self.y_)
+
+    def predict(self, X, return_std = False):
+        if return_std:
+            raise ValueError("BoostingSurrogate provides no std")
+        return self.estimator_.predict(np.asarray(X, dtype = float))
+
+class GaussianProcessSurrogate(Surrogate):
+    """Gaussian process that reuses its kernel hyperparameters
+
+    Each update starts from the previous fit's kernel (kernel_): every
+    reoptimize_every updates, the hyperparameters are re-optimized from there
+    without restarts; otherwise they are held fixed and only the Cholesky
+    factor is recomputed.
+
+    :param estimator: Template model; default
+        GaussianProcessRegressor(normalize_y = True)
+    :type estimator: GaussianProcessRegressor
+    :param reoptimize_every: Updates between hyperparameter optimizations
+    :type reoptimize_every: integer
+    """
+    def __init__(self, estimator = None, reoptimize_every = 5):
+        self.estimator        = estimator
+        self.reoptimize_every = reoptimize_every
+
+    def _fit(self, warm):
+        template = self.estimator if self.estimator is not None else \
+            GaussianProcessRegressor(normalize_y = True)
+        gp = clone(template)
+        if warm:
+            gp.set_params(kernel = self.estimator_.kernel_, n_restarts_optimizer = 0)
+            if self.n_updates_ % self.reoptimize_every != 0:
+                gp.set_params(optimizer = None)
+        self.estimator_ = gp.fit(self.X_, self.y_)
+
+    def predict(self, X, return_std = False):
+        return self.estimator_.predict(np.asarray(X, dtype = float), return_std = return_std)
+
+## Batch acquisition strategies; each takes the fitted model, the candidate
+## features and a batch size k, and returns the positions of the k candidates
+## to acquire, best first
+def _topK(scores, k):
+    if k == 1:
+        return np.array([np.argmax(scores)])
+    if k >= scores.shape[0]:
+        return np.argsort(-scores, kind = "stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind = "stable")]
+
+def acquireGreedy(reg, X_test, k, rng):
+    """Acquire the k candidates with the highest predicted response"""
+    return _topK(np.asarray(reg.predict(X_test)), k)
+
+def acquireRandom(reg, X_test, k, rng):
+    """Acquire k candidates uniformly at random"""
+    return rng.choice(X_test.shape[0], k, replace = False)
+
+def acquireUCB(reg, X_test, k, rng, kappa = 2.0):
+    """Acquire the k candidates with the highest upper confidence bound
+    mean + kappa * std; the model must support predict(X, return_std = True),
+    e.g. GaussianProcessRegressor or BayesianRidge. Use
+    partial(acquireUCB, kappa = ...) to change kappa.
+    """
+    Y_mean, Y_std = reg.predict(X_test, return_std = True)
+    return _topK(np.asarray(Y_mean) + kappa * np.asarray(Y_std), k)
+
+ACQUISITIONS = {
+    "greedy": acquireGreedy,
+    "random": acquireRandom,
+    "ucb":    acquireUCB,
+}
+
+# Attach to a shared-memory block owned by another process
+def _attachSharedMemory(name):
+    """Open an existing block without registering it with this process's
+    resource tracker, which would otherwise unlink it when a worker exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:  # Python < 3.13
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name = name)
+        finally:
+            resource_tracker.register = register
+
+# Arrays shared with worker processes
+class SharedArray:
+    """Handle to a read-only numpy array held once in shared memory, or in a
+    memory-mapped .npy file, for worker processes
+
+    A SharedArray pickles to its name, shape and dtype only, so sending it to
+    a worker costs a few hundred bytes however large the array is; workers
+    attach on first use and read it through a zero-copy view. np.asarray()
+    of a handle gives that view, and sequentialLearningSimulator(), slSweep()
+    and crossValidate() accept handles in place of X and Y.
+
+    The process that creates a shared-memory handle owns the block: call
+    unlink() (or use the handle as a context manager) when done. Memory-
+    mapped handles leave their .npy file in place; a path without the .npy
+    extension gets it, as from np.save().
 
-    # Determine the superset of elements
-    all_elements = reduce(
-        lambda s1, s2: s1.union(s2),
-        all_formulas
-    )
+    Usage
+        with SharedArray(X) as X_shared, SharedArray(Y) as Y_shared:
+            history = sequentialLearningSimulator(X_shared, Y_shared, n_jobs = 8)
+        X_shared = SharedArray(X, path = "X.npy")
+    """
+    # Blocks attached by this process, by name
+    _attached = {}
+
+    def __init__(self, array, path = None):
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.name  = None
+        if path is not None:
+            path = os.fspath(path)
+            if not path.endswith(".npy"):
+                path += ".npy"  # the name np.save() writes
+            np.save(path, array)
+        else:
+            self._shm = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+            self.name = self._shm.name
+            SharedArray._attached[self.name] = self._shm
+            np.ndarray(array.shape, dtype = array.dtype, buffer = self._shm.buf)[...] = array
+        self.path  = path
+        self._view = None
+
+    @classmethod
+    def from_npy(cls, path):
+        """Handle to an existing .npy file"""
+        handle = cls.__new__(cls)
+        handle.__setstate__({"path": path, "name": None, "shape": None, "dtype": None})
+        view = handle.array
+        handle.shape, handle.dtype = view.shape, view.dtype.str
+        return handle
+
+    def __getstate__(self):
+        return {"path": self.path, "name": self.name, "shape": self.shape, "dtype": self.dtype}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._view = None
+
+    @property
+    def array(self):
+        """Zero-copy, read-only view of the array"""
+        if self._view is None:
+            if self.path is not None:
+                view = np.load(self.path, mmap_mode = "r")
+            else:
+                shm = SharedArray._attached.get(self.name)
+                if shm is None:
+                    shm = _attachSharedMemory(self.name)
+                    SharedArray._attached[self.name] = shm
+                view = np.ndarray(self.shape, dtype = np.dtype(self.dtype), buffer = shm.buf)
+            view.flags.writeable = False
+            self._view = view
+        return self._view
+
+    def __array__(self, dtype = None, copy = None):
+        if copy:
+            return np.array(self.array, dtype = dtype)
+        return self.array if dtype is None else self.array.astype(dtype, copy = False)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def unlink(self):
+        """Release and remove a shared-memory block; owner only"""
+        if self.name is not None and SharedArray._attached.get(self.name) is not None:
+            self._view = None
+            shm = SharedArray._attached.pop(self.name)
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def __repr__(self):
+        return "SharedArray(shape={}, dtype={}, {})".format(
+            self.shape, np.dtype(self.dtype),
+            "path={!r}".format(self.path) if self.path else "name={!r}".format(self.name)
+        )
 
-    # Join all formulas
-    df_composition = pd.DataFrame(columns = all_elements)
+# Early stopping shared by the replication engines
+def _padHistory(ind_train, Y, n_stop):
+    """Fill each row of ind_train past its stop point with the index of its
+    best acquisition so far, so the history stays rectangular and its
+    running maximum stays flat.
+    """
+    for ind, n in enumerate(n_stop):
+        if n < ind_train.shape[1]:
+            ind_train[ind, n:] = ind_train[ind, np.argmax(Y[ind_train[ind, :n]])]
+    return ind_train
+
+def _slReplication(X, Y, n_init, n_iter, model, batch_size, acquisition, seed,
+                   target = None, patience = None, max_fits = None, time_budget = None):
+    """Run one replication of sequentialLearningSimulator()
+
+    :param seed: Seed for this replication's random draws
+    :type seed: numpy SeedSequence
+    :returns: acquired indices, initial candidates first; padded with the
+        best index past an early stop
+    :rtype: numpy array
+    """
+    t_start = perf_counter()
+    X       = np.asarray(X)  # zero-copy view of a SharedArray
+    Y       = np.asarray(Y)
+    rng     = np.random.default_rng(seed)
+    model   = clone(model)
+    n_total = Y.shape[0]
 
-    for ind in range(len(all_compositions)):
-        df_composition = df_composition.append(
-            pd.DataFrame(
-                columns = all_compositions[ind].keys(),
-                data = [all_compositions[ind].values()]
-            ),
-            ignore_index = True,
-            sort = True
-        )
-        df_composition = df_composition.fillna(0)
+    ## Training pool in acquisition order, and its membership mask
+    ind_train = np.empty(n_init + n_iter, dtype = np.intp)
+    is_train  = np.zeros(n_total, dtype = bool)
+
+    ## Random initial selection
+    ind_train[:n_init] = rng.choice(n_total, n_init, replace = False)
+    is_train[ind_train[:n_init]] = True
+
+    ## Models with an update() hook are fit once, then updated in place
+    incremental = hasattr(model, "update")
+
+    ## Stopping state
+    Y_best     = np.max(Y[ind_train[:n_init]])
+    since_best = 0
+    n_fits     = 0
+
+    ## Iteration loop; one batch per round
+    n_train = n_init
+    n_prev  = 0
+    while n_train < n_init + n_iter:
+        if (target is not None and Y_best >= target) \
+                or (patience is not None and since_best >= patience) \
+                or (max_fits is not None and n_fits >= max_fits) \
+                or (time_budget is not None and perf_counter() - t_start >= time_budget):
+            return _padHistory(ind_train[None], Y, [n_train])[0]
+        k = min(batch_size, n_init + n_iter - n_train)
+
+        ## Train model
+        if incremental and n_prev > 0:
+            ind_new = ind_train[n_prev:n_train]
+            reg = model.update(X[ind_new], Y[ind_new])
+        else:
+            reg = model.fit(X[ind_train[:n_train]], Y[ind_train[:n_train]])
+        n_fits += 1
 
-    return df_composition
+        ## Predict on test data; a linear scan of the mask, in index order
+        ind_test = np.flatnonzero(~is_train)
+
+        ## Select best candidates
+        ind_best = ind_test[acquisition(reg, X[ind_test], k, rng)]
+
+        ## Record and advance
+        ind_train[n_train:n_train + k] = ind_best
+        is_train[ind_best] = True
+        n_prev, n_train = n_train, n_train + k
+        if np.max(Y[ind_best]) > Y_best:
+            Y_best, since_best = np.max(Y[ind_best]), 0
+        else:
+            since_best += k
+
+    return ind_train
+
+# Working memory of one lockstep block; about 48 bytes per (replication,
+# candidate) pair go to the score matrix, masks and index arrays each round
+_LOCKSTEP_BYTES = 2**25
+
+# Cutoff for small singular values in LinearRegression's dense solver: tol
+# from scikit-learn 1.9, scipy.linalg.lstsq's default before
+_LSTSQ_TOL = tuple(
+    int(part) for part in re.findall(r"\d+", sklearn.__version__)[:2]
+) >= (1, 9)
+
+# Ridge penalty of the closed-form models _slLockstep() can batch
+def _lockstepPenalty(model):
+    """Return the ridge penalty if model is a plain LinearRegression (0) or
+    Ridge with a scalar alpha, else None.
+    """
+    if type(model) is LinearRegression and not model.positive:
+        return 0.0
+    if type(model) is Ridge and np.ndim(model.alpha) == 0 and not model.positive:
+        return float(model.alpha)
+    return None
+
+# All replications of a closed-form linear model at once
+def _slLockstep(X, Y, n_init, n_iter, model, batch_size, seeds,
+                target = None, patience = None, max_fits = None, time_budget = None):
+    """Run every replication of sequentialLearningSimulator() in lockstep
+    for a least-squares or ridge model with greedy acquisition
+
+    Each round solves the active replications' normal equations as one
+    stacked problem and scores every candidate for every replication with a
+    single matmul; replications drop out as they stop early. Initial
+    candidates are drawn as in _slReplication(), and least squares uses an
+    SVD with LinearRegression's cutoff (tol from scikit-learn 1.9), so
+    rank-deficient systems get the same minimum-norm solution. The histories
+    match the replication loop except where candidates tie to rounding, e.g.
+    duplicate feature rows.
+    As in the loop, time_budget applies to each replication: the wall time
+    of every round is split evenly among the replications it advanced.
+
+    Replications run in blocks small enough that a round's arrays stay
+    within _LOCKSTEP_BYTES, so large pools cost memory per block rather than
+    per replication; with a million candidates, a block is one replication.
+
+    :param seeds: Seeds for the replications' random draws
+    :type seeds: list of numpy SeedSequence
+    :returns: acquired indices, initial candidates first; one row per
+        replication
+    :rtype: numpy array
+    """
+    alpha   = _lockstepPenalty(model)
+    n_repl  = len(seeds)
+    n_total = Y.shape[0]
+    block   = max(1, _LOCKSTEP_BYTES // (48 * n_total))
+    if n_repl > block:
+        return np.concatenate([
+            _slLockstep(
+                X, Y, n_init, n_iter, model, batch_size, seeds[start:start + block],
+                target = target, patience = patience, max_fits = max_fits,
+                time_budget = time_budget
+            )
+            for start in range(0, n_repl, block)
+        ])
+    X = np.asarray(X, dtype = float)
+    Y = np.asarray(Y, dtype = float)
+
+    ## Training pools in acquisition order, and their membership masks
+    ind_train = np.empty((n_repl, n_init + n_iter), dtype = np.intp)
+    is_train  = np.zeros((n_repl, n_total), dtype = bool)
+    for ind, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        ind_train[ind, :n_init] = rng.choice(n_total, n_init, replace = False)
+    np.put_along_axis(is_train, ind_train[:, :n_init], True, axis = 1)
+
+    ## Stopping state
+    t_spent    = np.zeros(n_repl)
+    Y_best     = np.max(Y[ind_train[:, :n_init]], axis = 1)
+    since_best = np.zeros(n_repl, dtype = np.intp)
+    n_stop     = np.full(n_repl, n_init + n_iter)
+    n_fits     = 0
+    active     = np.arange(n_repl)
+
+    n_train = n_init
+    while n_train < n_init + n_iter:
+        stop = np.zeros(active.shape[0], dtype = bool)
+        if target is not None:
+            stop |= Y_best[active] >= target
+        if patience is not None:
+            stop |= since_best[active] >= patience
+        if time_budget is not None:
+            stop |= t_spent[active] >= time_budget
+        if max_fits is not None and n_fits >= max_fits:
+            stop[:] = True
+        n_stop[active[stop]] = n_train
+        active = active[~stop]
+        if active.shape[0] == 0:
+            break
+        t_round = perf_counter()
+        k = min(batch_size, n_init + n_iter - n_train)
+
+        ## Stacked normal equations; (n_active, n_train, d) training sets
+        X_train = X[ind_train[active, :n_train]]
+        Y_train = Y[ind_train[active, :n_train]]
+        if model.fit_intercept:
+            X_mean  = X_train.mean(axis = 1)
+            Y_mean  = Y_train.mean(axis = 1)
+            X_train = X_train - X_mean[:, None, :]
+            Y_train = Y_train - Y_mean[:, None]
+        if alpha > 0:
+            X_trans = X_train.transpose(0, 2, 1)
+            G    = X_trans @ X_train + alpha * np.eye(X.shape[1])
+            coef = np.linalg.solve(G, X_trans @ Y_train[:, :, None])[:, :, 0]
+        else:
+            ## Stacked SVD-based least squares, with LinearRegression's cutoff
+            rcond  = model.tol if _LSTSQ_TOL else np.finfo(float).eps
+            X_pinv = np.linalg.pinv(X_train, rcond = rcond)
+            coef   = (X_pinv @ Y_train[:, :, None])[:, :, 0]
+        if model.fit_intercept:
+            intercept = Y_mean - np.einsum("ri,ri->r", X_mean, coef)
+        else:
+            intercept = np.zeros(active.shape[0])
+        n_fits += 1
+
+        ## Score the whole pool for every replication at once, then keep each
+        ## replication's candidates in index order, as _slReplication() does
+        scores   = (X @ coef.T).T + intercept[:, None]
+        is_test  = ~is_train[active]
+        n_test   = n_total - n_train
+        ind_test = np.nonzero(is_test)[1].reshape(active.shape[0], n_test)
+        scores   = scores[is_test].reshape(active.shape[0], n_test)
+
+        ## Best k per replication, best first; ties broken as in _topK()
+        if k == 1:
+            top = np.argmax(scores, axis = 1)[:, None]
+        elif k >= n_test:
+            top = np.argsort(-scores, axis = 1, kind = "stable")
+        else:
+            top   = np.argpartition(-scores, k - 1, axis = 1)[:, :k]
+            order = np.argsort(
+                -np.take_along_axis(scores, top, axis = 1), axis = 1, kind = "stable"
+            )
+            top = np.take_along_axis(top, order, axis = 1)
+        ind_best = np.take_along_axis(ind_test, top, axis = 1)
+
+        ## Record and advance
+        ind_train[active, n_train:n_train + k] = ind_best
+        is_train[active[:, None], ind_best] = True
+        n_train += k
+        Y_new    = np.max(Y[ind_best], axis = 1)
+        improved = Y_new > Y_best[active]
+        Y_best[active]     = np.maximum(Y_best[active], Y_new)
+        since_best[active] = np.where(improved, 0, since_best[active] + k)
+        t_spent[active]   += (perf_counter() - t_round) / active.shape[0]
+
+    return _padHistory(ind_train, Y, n_stop)
+
+# Stable description of a model or strategy, for cache keys
+def _fingerprint(obj):
+    """Raises ValueError for objects without an exact description that is
+    stable across sessions: lambdas, closures, and objects that are neither
+    plain values, arrays, module-level callables nor have get_params()
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return repr(obj)
+    if isinstance(obj, np.generic):
+        return _fingerprint(obj.item())
+    if isinstance(obj, np.ndarray):
+        array = np.ascontiguousarray(obj)
+        return [
+            "ndarray", list(array.shape), array.dtype.str,
+            hashlib.sha256(array.tobytes()).hexdigest()
+        ]
+    if isinstance(obj, (list, tuple)):
+        return [type(obj).__name__, [_fingerprint(item) for item in obj]]
+    if isinstance(obj, dict):
+        return ["dict", sorted((repr(k), _fingerprint(v)) for k, v in obj.items())]
+    if isinstance(obj, partial):
+        return [
+            _fingerprint(obj.func),
+            [_fingerprint(arg) for arg in obj.args],
+            sorted((k, _fingerprint(v)) for k, v in obj.keywords.items())
+        ]
+    ## Estimators, and parameterized objects such as GP kernels
+    if hasattr(obj, "get_params") and not isinstance(obj, type):
+        return [
+            type(obj).__module__ + "." + type(obj).__qualname__,
+            sorted(
+                (k, _fingerprint(v)) \
+                for k, v in obj.get_params(deep = False).items()
+            )
+        ]
+    if callable(obj) and hasattr(obj, "__qualname__"):
+        if "<lambda>" in obj.__qualname__ or "<locals>" in obj.__qualname__:
+            raise ValueError("{!r} is not a module-level function".format(obj))
+        return obj.__module__ + "." + obj.__qualname__
+    raise ValueError("{!r} has no exact description".format(obj))
+
+class SLResultCache:
+    """Content-addressed on-disk store for sequentialLearningSimulator()
+
+    Each result is an acq_history saved as <key>.npz, where the key hashes X,
+    Y, the model and the simulation settings. Hits refresh a file's mtime;
+    once the store outgrows max_bytes, the least recently used files are
+    evicted. Files are written to a temporary name and renamed into place,
+    so several processes can share one directory without locks. A reader
+    sees either a complete file or a miss.
+
+    :param directory: Cache directory; created if missing
+    :type directory: string
+    :param max_bytes: Size limit of the store
+    :type max_bytes: integer
+    """
+    def __init__(self, directory = ".sl_cache", max_bytes = 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok = True)
+
+    def key(self, X, Y, **settings):
+        """Hash the data and settings of a simulation; None when a setting
+        cannot be identified across sessions (a lambda, a closure, ...)
+        """
+        try:
+            settings = json.dumps(
+                sorted((k, _fingerprint(v)) for k, v in settings.items())
+            )
+        except ValueError:
+            return None
+        digest = hashlib.sha256()
+        for array in (np.ascontiguousarray(X), np.ascontiguousarray(Y)):
+            digest.update(repr((array.shape, array.dtype.str)).encode())
+            digest.update(array.tobytes())
+        digest.update(settings.encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """Return the cached acq_history for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                acq_history = data["acq_history"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return acq_history
+
+    def put(self, key, acq_history):
+        """Store an acq_history under key, then evict down to max_bytes"""
+        fd, tmp = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, acq_history = acq_history)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used results until under max_bytes"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
 
-## Sequential Learning Simulator
-##################################################
 def sequentialLearningSimulator(
         X, Y,
-        n_init = N_INIT,
-        n_iter = 40,
-        n_repl = 50,
-        model  = LinearRegression()
+        n_init      = N_INIT,
+        n_iter      = 40,
+        n_repl      = 50,
+        model       = None,
+        seed        = 101,
+        n_jobs      = 1,
+        executor    = None,
+        batch_size  = 1,
+        acquisition = "greedy",
+        cache       = None,
+        vectorize   = True,
+        target      = None,
+        patience    = None,
+        max_fits    = None,
+        time_budget = None,
+        return_stops = False
 ):
     """Perform simulated sequential learning on a given dataset
 
+    Replications are independent, and each draws its initial candidates from
+    its own child of a root SeedSequence(seed). The acquisition history for a
+    given seed is therefore identical however many workers run.
+
     :param X: Feature dataset
-    :type X: numpy array
+    :type X: numpy array or SharedArray
     :param Y: Response dataset
-    :type Y: numpy array
-    :param acq: acquisition strategy
-    :returns: acquisition history
-    :rtype: numpy array
+    :type Y: numpy array or SharedArray
+    :param model: Regression model, cloned for every replication;
+        defaults to LinearRegression(). Models with an update(X, y) method,
+        such as IncrementalLinearRegression() or a Surrogate (ForestSurrogate,
+        BoostingSurrogate, GaussianProcessSurrogate), are fit once and then
+        updated with each acquired batch.
+    :type model: scikit-learn estimator
+    :param seed: Root seed for the replications
+    :type seed: integer
+    :param n_jobs: Number of worker processes; -1 uses every core
+    :type n_jobs: integer
+    :param executor: Executor to map replications over, in place of n_jobs;
+        left open for reuse
+    :type executor: concurrent.futures Executor
+    :param batch_size: Number of candidates acquired per model fit; n_iter
+        counts acquired candidates, so the last batch may be smaller
+    :type batch_size: integer
+    :param acquisition: Batch acquisition strategy; one of "greedy",
+        "random", "ucb", or a function acquisition(reg, X_test, k, rng)
+        returning the positions of k candidates in X_test (module-level, so
+        that it can be sent to worker processes)
+    :type acquisition: string or function
+    :param cache: Result cache, or its directory; defaults to the directory
+        in the WORKSHOP_SL_CACHE environment variable, if set. A hit
+        returns the stored history without simulating. Runs whose model or
+        acquisition involves a lambda, a closure or another object without
+        an exact description (e.g. a RandomState) are not cached.
+    :type cache: SLResultCache or string
+    :param vectorize: Advance all replications in lockstep, with stacked
+        solves and one scoring matmul per round, when the model is a plain
+        LinearRegression or Ridge and acquisition is "greedy"; n_jobs and
+        executor are then unused
+    :type vectorize: boolean
+    :param target: Stop a replication once it has acquired a response of at
+        least target; "max" uses the maximum of Y
+    :type target: float or string
+    :param patience: Stop a replication after this many acquisitions without
+        improving on its best response
+    :type patience: integer
+    :param max_fits: Stop a replication after this many model fits
+    :type max_fits: integer
+    :param time_budget: Stop a replication after this many seconds of wall
+        time spent on it, by either engine; in lockstep, each round's time
+        is shared evenly among the replications it advanced. Results under
+        a time budget are not cached
+    :type time_budget: float
+    :param return_stops: Also return each replication's stop point
+    :type return_stops: boolean
+    :returns: acquisition history; indices into Y. A replication that stops
+        early is padded with the index of its best acquisition, so the
+        history stays rectangular for plotHistory(). With return_stops, also
+        the number of acquisitions (initial candidates included) each
+        replication made, as from historyStops()
+    :rtype: integer numpy array, or tuple of two
     """
-    np.random.seed(101)
+    ## Worker tasks get SharedArray handles as they are; the rest, arrays
+    X_task, Y_task = X, Y
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    if not isinstance(X_task, SharedArray):
+        X_task = X
+    if not isinstance(Y_task, SharedArray):
+        Y_task = Y
+    if model is None:
+        model = LinearRegression()
+
+    acquisition = ACQUISITIONS.get(acquisition, acquisition)
+    if isinstance(target, str) and target == "max":
+        target = np.max(Y)
+    stopping = dict(
+        target = target, patience = patience,
+        max_fits = max_fits, time_budget = time_budget
+    )
 
-    n_total = Y.shape[0]
+    ## Serve repeated simulations from the result cache
+    if cache is None:
+        cache = os.environ.get("WORKSHOP_SL_CACHE")
+    if isinstance(cache, str):
+        cache = SLResultCache(cache)
+    if time_budget is not None:
+        cache = None
+    if cache is not None:
+        key = cache.key(
+            X, Y,
+            n_init = n_init, n_iter = n_iter, n_repl = n_repl, model = model,
+            seed = seed, batch_size = batch_size, acquisition = acquisition,
+            vectorize = vectorize,
+            **{k: v for k, v in stopping.items() if v is not None}
+        )
+        if key is None:
+            cache = None
+    if cache is not None:
+        acq_history = cache.get(key)
+        if acq_history is not None:
+            return (acq_history, historyStops(acq_history)) if return_stops else acq_history
+
+    seeds = np.random.SeedSequence(seed).spawn(n_repl)
+
+    ## Closed-form models: all replications at once
+    if vectorize and acquisition is acquireGreedy and _lockstepPenalty(model) is not None:
+        acq_history = _slLockstep(
+            X, Y, n_init, n_iter, model, batch_size, seeds, **stopping
+        )
+        if cache is not None:
+            cache.put(key, acq_history)
+        return (acq_history, historyStops(acq_history)) if return_stops else acq_history
 
-    acq_history = np.zeros((n_repl, n_iter + n_init))
-    ind_all = range(n_total)
+    replication = partial(
+        _slReplication,
+        X_task, Y_task, n_init, n_iter, model, batch_size, acquisition, **stopping
+    )
 
     ## Replication loop
-    for ind in range(n_repl):
-        ## Random initial selection
-        ind_train = np.random.choice(n_total, n_init, replace = False)
-        acq_history[ind, :n_init] = ind_train
+    if executor is not None:
+        histories = list(executor.map(replication, seeds))
+    elif n_jobs != 1:
+        with ProcessPoolExecutor(
+                max_workers = None if n_jobs == -1 else n_jobs
+        ) as pool:
+            histories = list(pool.map(replication, seeds))
+    else:
+        histories = list(map(replication, seeds))
 
-        ## Iteration loop
-        for jnd in range(n_iter):
-            ## Train model
-            reg = model.fit(X[ind_train], Y[ind_train])
+    acq_history = np.zeros((n_repl, n_iter + n_init), dtype = np.intp)
+    for ind, history in enumerate(histories):
+        acq_history[ind] = history
 
-            ## Predict on test data
-            ind_test    = np.setxor1d(ind_all, ind_train)
-            Y_pred_test = reg.predict(X[ind_test])
+    if cache is not None:
+        cache.put(key, acq_history)
 
-            ## Select best candidate
-            ind_best = ind_test[np.argmax(Y_pred_test)]
+    return (acq_history, historyStops(acq_history)) if return_stops else acq_history
 
-            ## Record and advance
-            ind_train = np.concatenate((ind_train, [ind_best]))
-            acq_history[ind, n_init + jnd] = ind_best
+# Stop points of padded acquisition histories
+def historyStops(acq_history):
+    """Number of acquisitions each replication made before stopping early,
+    initial candidates included; the full history length for replications
+    that ran to the end. The padding past a stop repeats an earlier index,
+    while acquisitions never do, so the stop point is the first repeat.
 
-    return acq_history
+    :param acq_history: Output from sequentialLearningSimulator()
+    :type acq_history: numpy array
+    :returns: stop point of each replication
+    :rtype: integer numpy array
+    """
+    acq_history = np.asarray(acq_history)
+    n_repl, n_total = acq_history.shape
+
+    ## Sort each row; a repeat is an equal neighbour later in the history
+    order    = np.argsort(acq_history, axis = 1, kind = "stable")
+    ind_sort = np.take_along_axis(acq_history, order, axis = 1)
+    repeat   = ind_sort[:, 1:] == ind_sort[:, :-1]
+    stops    = np.full(n_repl, n_total)
+    rows, cols = np.nonzero(repeat)
+    np.minimum.at(stops, rows, order[:, 1:][rows, cols])
+
+    return stops
+
+class HistorySummary:
+    """Statistics of sequential learning histories over replications
+
+    Iteration 0 is the mean response of the initial candidates; later
+    iterations are the best response acquired so far.
+
+    :ivar iteration: Iteration numbers, 0 to n_iter
+    :ivar max_value: Largest response in the dataset
+    :ivar mean: Mean over replications of the cumulative maximum
+    :ivar median: Median over replications of the cumulative maximum
+    :ivar quantiles: Quantile levels of the bands
+    :ivar bands: Quantiles of the cumulative maximum; one row per level
+    :ivar n_repl: Number of replications
+    """
+    _fields = ("iteration", "max_value", "mean", "median", "quantiles", "bands", "n_repl")
+
+    def __init__(self, **fields):
+        for name in self._fields:
+            setattr(self, name, fields[name])
+
+    def to_frame(self):
+        """Tidy DataFrame with one row per iteration"""
+        df = pd.DataFrame({
+            "iteration": self.iteration,
+            "mean":      self.mean,
+            "median":    self.median,
+        })
+        for q, band in zip(self.quantiles, self.bands):
+            df["q{0:g}".format(q)] = band
+        return df
+
+    def save(self, fpath):
+        """Save to a compressed .npz file"""
+        np.savez_compressed(fpath, **{name: getattr(self, name) for name in self._fields})
+
+    @classmethod
+    def load(cls, fpath):
+        """Load from a file written by save()"""
+        with np.load(fpath) as data:
+            return cls(**{name: data[name] for name in cls._fields})
+
+def summarizeHistory(acq_history, Y, n_init = N_INIT, quantiles = (0.1, 0.9)):
+    """Compute the statistics plotted by plotHistory(), vectorized over
+    replications
+
+    :param acq_history: Output from sequentialLearningSimulator()
+    :type acq_history: numpy array
+    :param Y: Response values
+    :type Y: numpy array
+    :param n_init: Number of initial candidates
+    :type n_init: integer
+    :param quantiles: Quantile levels for the bands
+    :type quantiles: iterable of floats
+    :returns: summary statistics
+    :rtype: HistorySummary
+    """
+    acq_history = np.asarray(acq_history).astype(np.intp, copy = False)
+    Y           = np.asarray(Y)
+    n_iter      = acq_history.shape[1] - n_init
+
+    ## One gather for all replications
+    Y_hist = Y[acq_history]
+
+    ## Average the initial points
+    Y_hist = np.concatenate(
+        (np.mean(Y_hist[:, :n_init], axis = 1, keepdims = True), Y_hist[:, n_init:]),
+        axis = 1
+    )
+    ## Take cumulative maximum
+    Y_max = np.maximum.accumulate(Y_hist, axis = 1)
+
+    ## Statistics over replications; one sort serves every quantile
+    ## (linear interpolation, as in np.quantile)
+    quantiles = np.asarray(quantiles, dtype = float)
+    Y_sorted  = np.sort(Y_max, axis = 0)
+    position  = np.concatenate(([0.5], quantiles)) * (Y_sorted.shape[0] - 1)
+    lower     = np.floor(position).astype(np.intp)
+    upper     = np.ceil(position).astype(np.intp)
+    Y_quant   = Y_sorted[lower] + \
+        (position - lower)[:, None] * (Y_sorted[upper] - Y_sorted[lower])
+
+    return HistorySummary(
+        iteration = np.arange(n_iter + 1),
+        max_value = np.max(Y),
+        mean      = np.mean(Y_max, axis = 0),
+        median    = Y_quant[0],
+        quantiles = quantiles,
+        bands     = Y_quant[1:],
+        n_repl    = acq_history.shape[0],
+    )
 
 def plotHistory(acq_history, Y, label, n_init = N_INIT, color = "black"):
     """Plot the results of a sequential learning simulation
@@ -241,29 +1970,374 @@ def plotHistory(acq_history, Y, label, n_init = N_INIT, color = "black"):
     :param color: Color for plotted history
     :type color: string
     :type Y: numpy array
+    :returns: summary statistics of the plotted history
+    :rtype: HistorySummary
     """
-    n_iter = acq_history.shape[1] - n_init
-    Y_hist = np.array([Y[acq_history[i, :]] for i in range(acq_history.shape[0])])
+    summary = summarizeHistory(acq_history, Y, n_init = n_init)
+    Iter    = summary.iteration
 
-    max_value   = np.max(Y)
+    plt.plot(Iter, [summary.max_value] * len(Iter), "k:")
+    # Median of maxes
+    plt.plot(Iter, summary.median, color = color, linewidth = 3, label = label)
+    plt.legend(loc = 0)
 
-    ## Average the initial points
-    Y_hist = np.concatenate(
-        (np.atleast_2d(np.mean(Y_hist[:, :n_init], axis = 1)).T, Y_hist[:, n_init:]),
-        axis = 1
+    return summary
+
+# Display name of an acquisition strategy
+def _acquisitionName(acquisition):
+    if isinstance(acquisition, str):
+        return acquisition
+    return getattr(acquisition, "__name__", repr(acquisition))
+
+# Grid of sequential learning configurations
+def slGrid(features, models, n_init = (N_INIT,), acquisition = ("greedy",),
+           batch_size = (1,)):
+    """Cartesian product of sequential learning settings, for slSweep()
+
+    :param features: Feature matrices by name
+    :type features: dict of numpy arrays or SharedArrays
+    :param models: Regression models by name
+    :type models: dict of scikit-learn estimators
+    :param n_init: Numbers of initial candidates
+    :type n_init: iterable of integers
+    :param acquisition: Acquisition strategies; names or functions
+    :type acquisition: iterable
+    :param batch_size: Batch sizes
+    :type batch_size: iterable of integers
+    :returns: one dict per configuration, with keys name, features, model
+        (its name), X, estimator, n_init, acquisition and batch_size
+    :rtype: list of dicts
+    """
+    configs = []
+    for (f_name, X), (m_name, model), n, acq, k in product(
+            features.items(), models.items(), n_init, acquisition, batch_size
+    ):
+        configs.append(dict(
+            name        = "{}/{}/n_init={}/{}/k={}".format(
+                f_name, m_name, n, _acquisitionName(acq), k
+            ),
+            features    = f_name,
+            model       = m_name,
+            X           = X,
+            estimator   = model,
+            n_init      = n,
+            acquisition = acq,
+            batch_size  = k,
+        ))
+    return configs
+
+def _slSweepTask(ind_config, ind_repl, X, Y, n_init, n_iter, model, batch_size,
+                 acquisition, seed):
+    """One (configuration, replication) task of slSweep()"""
+    t0 = perf_counter()
+    history = _slReplication(
+        X, Y, n_init, n_iter, model, batch_size,
+        ACQUISITIONS.get(acquisition, acquisition), seed
     )
-    ## Take cumulative maximum
-    Y_max = np.maximum.accumulate(Y_hist, axis = 1)
-    ## Statistics over replications
-    Y_mean    = np.mean(Y_max, axis = 0)
-    Y_median  = np.median(Y_max, axis = 0)
-    Y_upper   = np.quantile(Y_max, 0.9, axis = 0)
-    Iter      = np.arange(n_iter + 1)
+    return ind_config, ind_repl, history, perf_counter() - t0
+
+def slSweep(configs, Y, n_iter = 40, n_repl = 50, seed = 101, n_jobs = -1,
+            executor = None, out_dir = None, quantiles = (0.1, 0.9)):
+    """Run a sweep of sequential learning configurations on one worker pool
+
+    Every (configuration, replication) pair is a separate task, and all of
+    them are queued on one pool, so a worker that finishes early takes the
+    next task from any configuration rather than waiting for a slow one.
+    Replication i of every configuration uses the i-th child of
+    SeedSequence(seed), as sequentialLearningSimulator() does, so each
+    configuration's history is the one the simulator returns for it.
+
+    If out_dir is given, each history is written to out_dir/<name>.npy as
+    its replications finish, next to out_dir/<name>.json recording the
+    settings it was run with (seed, n_iter, hashes of X and Y, the model and
+    acquisition). Rerunning the same sweep with the same out_dir skips the
+    replications already on disk; a history run with other settings raises
+    ValueError rather than being reused. Configurations involving a lambda
+    or closure cannot be identified, so they are always run afresh.
+
+    :param configs: Configurations, e.g. from slGrid(); each a dict with
+        keys name, X (an array or SharedArray), n_init, acquisition and
+        batch_size, and estimator (the model)
+    :type configs: list of dicts
+    :param Y: Response values
+    :type Y: numpy array or SharedArray
+    :param n_iter: Number of sequential learning iterations
+    :type n_iter: integer
+    :param n_repl: Number of replications per configuration
+    :type n_repl: integer
+    :param seed: Root seed for the replications
+    :type seed: integer
+    :param n_jobs: Number of worker processes; -1 uses every core
+    :type n_jobs: integer
+    :param executor: Executor to run the tasks on, in place of n_jobs
+    :type executor: concurrent.futures Executor
+    :param out_dir: Directory for streamed results
+    :type out_dir: string
+    :param quantiles: Quantile levels for the comparison table
+    :type quantiles: iterable of floats
+    :returns: comparison table with one row per configuration (final
+        iteration statistics of summarizeHistory(), the fraction of
+        replications reaching the maximum of Y, and task seconds), and the
+        acquisition histories by configuration name
+    :rtype: tuple of DataFrame and dict of numpy arrays
+    """
+    Y_task = Y if isinstance(Y, SharedArray) else np.asarray(Y)
+    Y      = np.asarray(Y)
+    seeds  = np.random.SeedSequence(seed).spawn(n_repl)
+
+    ## Histories, on disk if requested; -1 marks replications still to run
+    histories = {}
+    digests   = {}
+    for config in configs:
+        shape = (n_repl, config["n_init"] + n_iter)
+        path  = None if out_dir is None else os.path.join(
+            out_dir, re.sub(r"[^\w.=-]+", "_", config["name"]) + ".npy"
+        )
+        if path is None:
+            histories[config["name"]] = np.full(shape, -1, dtype = np.intp)
+            continue
 
-    plt.plot(Iter, [max_value] * (n_iter + 1), "k:")
-    # Median of maxes
-    plt.plot(Iter, Y_median, color = color, linewidth = 3, label = label)
-    plt.legend(loc = 0)
+        ## Settings the history on disk must have been run with
+        for array in (config["X"], Y_task):
+            if id(array) not in digests:
+                digests[id(array)] = _fingerprint(np.asarray(array))
+        try:
+            stamp = json.loads(json.dumps({
+                "seed": seed, "n_iter": n_iter, "n_init": config["n_init"],
+                "batch_size": config["batch_size"],
+                "X": digests[id(config["X"])], "Y": digests[id(Y_task)],
+                "model": _fingerprint(config["estimator"]),
+                "acquisition": _fingerprint(config["acquisition"]),
+            }))
+        except ValueError:
+            stamp = None
+        stamp_path = path[:-len(".npy")] + ".json"
+        if stamp is not None and os.path.exists(path) and os.path.exists(stamp_path):
+            with open(stamp_path, "r") as f:
+                if json.load(f) != stamp:
+                    raise ValueError(
+                        "{} was run with other settings; remove it, or use "
+                        "another out_dir".format(path)
+                    )
+            history = np.load(path, mmap_mode = "r+")
+            if history.shape == shape:
+                histories[config["name"]] = history
+                continue
+        os.makedirs(out_dir, exist_ok = True)
+        with open(stamp_path, "w") as f:
+            json.dump(stamp, f)
+        histories[config["name"]] = np.lib.format.open_memmap(
+            path, mode = "w+", dtype = np.intp, shape = shape
+        )
+        histories[config["name"]][:] = -1
+
+    tasks = [
+        (ind_config, ind_repl, config["X"], Y_task, config["n_init"], n_iter,
+         config["estimator"], config["batch_size"], config["acquisition"], seeds[ind_repl])
+        for ind_config, config in enumerate(configs)
+        for ind_repl in range(n_repl)
+        if histories[config["name"]][ind_repl, 0] < 0
+    ]
+
+    ## Record each task as it finishes
+    seconds = np.zeros(len(configs))
+    def record(result):
+        ind_config, ind_repl, history, t = result
+        acq_history = histories[configs[ind_config]["name"]]
+        acq_history[ind_repl] = history
+        if isinstance(acq_history, np.memmap):
+            acq_history.flush()
+        seconds[ind_config] += t
+
+    if executor is None and n_jobs == 1:
+        for task in tasks:
+            record(_slSweepTask(*task))
+    else:
+        pool = executor if executor is not None else ProcessPoolExecutor(
+            max_workers = None if n_jobs == -1 else n_jobs
+        )
+        try:
+            futures = [pool.submit(_slSweepTask, *task) for task in tasks]
+            for future in as_completed(futures):
+                record(future.result())
+        finally:
+            if executor is None:
+                pool.shutdown(cancel_futures = True)
+
+    ## Comparison table of the final-iteration statistics
+    rows = []
+    for ind_config, config in enumerate(configs):
+        acq_history = np.asarray(histories[config["name"]])
+        summary = summarizeHistory(
+            acq_history, Y, n_init = config["n_init"], quantiles = quantiles
+        )
+        row = {
+            "name":        config["name"],
+            "features":    config.get("features"),
+            "model":       config.get("model"),
+            "n_init":      config["n_init"],
+            "acquisition": _acquisitionName(config["acquisition"]),
+            "batch_size":  config["batch_size"],
+            "mean":        summary.mean[-1],
+            "median":      summary.median[-1],
+        }
+        for q, band in zip(summary.quantiles, summary.bands):
+            row["q{0:g}".format(q)] = band[-1]
+        row["frac_max"] = np.mean(Y[acq_history].max(axis = 1) >= summary.max_value)
+        row["seconds"]  = seconds[ind_config]
+        rows.append(row)
+        histories[config["name"]] = acq_history
+
+    return pd.DataFrame(rows), histories
+
+## Cross validation
+##################################################
+# Fold indices, computed once per (n_samples, n_splits, seed)
+@lru_cache(maxsize = 64)
+def _foldIndices(n_samples, n_splits, seed):
+    """K-fold (train, test) index pairs; contiguous folds when seed is None,
+    as in cross_validate(cv = n_splits), else shuffled with the seed.
+    """
+    splitter = KFold(n_splits, shuffle = seed is not None, random_state = seed)
+    folds = tuple(splitter.split(np.empty((n_samples, 0))))
+    for train, test in folds:
+        train.flags.writeable = False
+        test.flags.writeable  = False
+    return folds
+
+# Fitted preprocessing per (call, preprocessor, fold), in each process;
+# holds one crossValidate() call's folds at a time
+_CV_PREPROCESSED = {}
+_CV_PREPROCESSED_MAX = 32
+
+def _cvPreprocess(call_key, X, Y, pre_name, preprocessor, ind_fold, train, test):
+    """Fit preprocessor on a training fold and transform both folds, once
+    per process for each (crossValidate() call, preprocessor, fold)
+    """
+    if preprocessor is None:
+        return X[train], X[test]
+    key = (call_key, pre_name, ind_fold)
+    folds = _CV_PREPROCESSED.get(key)
+    if folds is None:
+        ## Drop other calls' folds, whose data or splits may differ
+        for old in [old for old in list(_CV_PREPROCESSED) if old[0] != call_key]:
+            _CV_PREPROCESSED.pop(old, None)
+        if len(_CV_PREPROCESSED) >= _CV_PREPROCESSED_MAX:
+            _CV_PREPROCESSED.pop(next(iter(_CV_PREPROCESSED)), None)
+        fitted = clone(preprocessor).fit(X[train], Y[train])
+        folds = (fitted.transform(X[train]), fitted.transform(X[test]))
+        _CV_PREPROCESSED[key] = folds
+    return folds
+
+def _cvTask(call_key, X, Y, pre_name, preprocessor, model_name, model,
+            ind_fold, train, test, scoring, return_train_score):
+    """One (preprocessor, model, fold) task of crossValidate()"""
+    X = np.asarray(X)  # zero-copy view of a SharedArray
+    Y = np.asarray(Y)
+    X_train, X_test = _cvPreprocess(
+        call_key, X, Y, pre_name, preprocessor, ind_fold, train, test
+    )
+
+    t0  = perf_counter()
+    reg = clone(model).fit(X_train, Y[train])
+    t1  = perf_counter()
+    scorer = check_scoring(reg, scoring = scoring)
+    row = {
+        "preprocessor": pre_name,
+        "model":        model_name,
+        "fold":         ind_fold,
+        "test_score":   scorer(reg, X_test, Y[test]),
+    }
+    if return_train_score:
+        row["train_score"] = scorer(reg, X_train, Y[train])
+    row["fit_time"]   = t1 - t0
+    row["score_time"] = perf_counter() - t1
+    return row
+
+# Cross validate many models on the same folds
+def crossValidate(models, X, Y, preprocessors = None, cv = 5, seed = None,
+                  scoring = None, return_train_score = True, n_jobs = 1,
+                  executor = None):
+    """Cross validate every (preprocessor, model) pair on shared folds
+
+    Fold indices are computed once per (number of samples, cv, seed) and
+    reused across calls. Each preprocessor is fit once per training fold and
+    its output reused by every model in the same call, and the (preprocessor, model, fold)
+    tasks run over one process pool. With the default seed = None and a
+    stateless preprocessor (e.g. PolynomialFeatures), the scores equal those
+    of cross_validate(model, preprocessor.fit_transform(X), Y, cv = cv).
+
+    :param models: Regression models by name
+    :type models: dict of scikit-learn estimators
+    :param X: Features
+    :type X: numpy array or SharedArray
+    :param Y: Response values
+    :type Y: numpy array or SharedArray
+    :param preprocessors: Transformers by name, fit on each training fold;
+        None for the raw features. Defaults to the raw features only
+    :type preprocessors: dict of scikit-learn transformers
+    :param cv: Number of folds, a splitter with a split(X, Y) method (e.g.
+        KFold), or an iterable of (train, test) index pairs
+    :type cv: integer, scikit-learn splitter or iterable
+    :param seed: Seed for shuffled folds; None keeps the folds contiguous
+    :type seed: integer
+    :param scoring: Scorer, as for cross_validate(); e.g. make_scorer(nde).
+        Defaults to the model's score() method
+    :type scoring: string or callable
+    :param return_train_score: Also score the training folds
+    :type return_train_score: boolean
+    :param n_jobs: Number of worker processes; -1 uses every core
+    :type n_jobs: integer
+    :param executor: Executor to run the tasks on, in place of n_jobs
+    :type executor: concurrent.futures Executor
+    :returns: score table with one row per (preprocessor, model, fold)
+    :rtype: DataFrame
+    """
+    if preprocessors is None:
+        preprocessors = {None: None}
+    X_task = X if isinstance(X, SharedArray) else np.asarray(X)
+    Y_task = Y if isinstance(Y, SharedArray) else np.asarray(Y)
+    n_samples = len(Y_task)
+
+    ## Folds, and a key naming this call in the workers' caches
+    if isinstance(cv, (int, np.integer)):
+        folds = _foldIndices(n_samples, int(cv), seed)
+    elif hasattr(cv, "split"):
+        folds = tuple(cv.split(np.asarray(X_task), np.asarray(Y_task)))
+    else:
+        folds = tuple((np.asarray(train), np.asarray(test)) for train, test in cv)
+    call_key = os.urandom(16).hex()
+
+    ## Tasks grouped by (preprocessor, fold), so each worker can reuse them
+    tasks = [
+        (call_key, X_task, Y_task, pre_name, preprocessor, model_name, model,
+         ind_fold, train, test, scoring, return_train_score)
+        for pre_name, preprocessor in preprocessors.items()
+        for ind_fold, (train, test) in enumerate(folds)
+        for model_name, model in models.items()
+    ]
+    try:
+        if executor is not None:
+            rows = list(executor.map(_cvTask, *zip(*tasks)))
+        elif n_jobs != 1:
+            with ProcessPoolExecutor(
+                    max_workers = None if n_jobs == -1 else n_jobs
+            ) as pool:
+                rows = list(pool.map(_cvTask, *zip(*tasks)))
+        else:
+            rows = [_cvTask(*task) for task in tasks]
+    finally:
+        ## Tasks run in this process (serially or on threads) leave folds here
+        for key in [key for key in list(_CV_PREPROCESSED) if key[0] == call_key]:
+            _CV_PREPROCESSED.pop(key, None)
+
+    ## One block of folds per (preprocessor, model)
+    order = {name: ind for ind, name in enumerate(models)}
+    pre_order = {name: ind for ind, name in enumerate(preprocessors)}
+    rows.sort(key = lambda row: (
+        pre_order[row["preprocessor"]], order[row["model"]], row["fold"]
+    ))
+    return pd.DataFrame(rows)
 
 
 ## Data cleaning workshop helpers
@@ -277,31 +2351,31 @@ def create_mapping_from_table(header_csv):
     :param header_csv: A string filepath to the CSV file.
     :return mapping: A dictionary mapping abbreviation to full name.
     '''
-    mapping = {}
     df = pd.read_csv(header_csv)
-
-    # Read each row of the df
-    for index, row in df.iterrows():
-        # Check for composition column; keep as is
-        if row['Details'].startswith('%'):
-            mapping[row['Abbreviation']] = 'ACTUAL COMPOSITION: {} (wt %)'.format(
-                row['Abbreviation'])
-
-        # Otherwise it's a Property name
-        else:
-            mapping[row['Abbreviation']] = 'PROPERTY: {}'.format(row['Details'])
+    abbreviation = df['Abbreviation'].astype(str)
+    details = df['Details'].astype(str)
+
+    # Composition columns keep their abbreviation;
+    # otherwise it's a Property name
+    names = np.where(
+        details.str.startswith('%'),
+        'ACTUAL COMPOSITION: ' + abbreviation + ' (wt %)',
+        'PROPERTY: ' + details
+    )
+    mapping = dict(zip(df['Abbreviation'], names.tolist()))
 
     print('Mapping dictionary successfully created.')
     return mapping
 
 
-def rename_columns_in_df(df, mapping):
+def rename_columns_in_df(df, mapping, verbose=True):
     '''
     This function takes a DataFrame with abbreviated header names and renames
     the columns.
 
     :param df: A pandas DataFrame with the data and abbreviated column names.
     :param mapping: A dictionary mapping abbreviated to detailed names.
+    :param verbose: Whether to print a confirmation message.
     :return df: A pandas DataFrame with the columns renamed.
     '''
     # Create new column names from supplied mapping by adding to empty list
@@ -311,16 +2385,18 @@ def rename_columns_in_df(df, mapping):
 
     # Change the columns of the DataFrame to the new names
     df.columns = new_cols
-    print('Columns are renamed and the DataFrame is saved to a new CSV file.')
+    if verbose:
+        print('Columns are renamed and the DataFrame is saved to a new CSV file.')
     return df
 
 
-def add_iron_composition(df):
+def add_iron_composition(df, verbose=True):
     '''
     This function takes a DataFrame with alloy elements and adds a column for
     the weight percent of iron, the base metal.
 
     :param df: A pandas DataFrame missing composition of iron.
+    :param verbose: Whether to print a confirmation message.
     :return df: A pandas DataFrame with composition of iron added in a new column.
     '''
     # Get only the columns that have composition
@@ -336,137 +2412,597 @@ def add_iron_composition(df):
 
     # Add the composition as a new column to the DataFrame
     df['ACTUAL COMPOSITION: Fe (wt %)'] = iron_comp
-    print('Iron composition column was added to the dataset.')
+    if verbose:
+        print('Iron composition column was added to the dataset.')
     return df
 
 
-def add_chemical_formula(df):
+def add_chemical_formula(df, verbose=True):
     '''
     This function takes in a pandas DataFrame and adds a column for the
     chemical formula by combining the constituent compositions.
 
     :param df: A pandas DataFrame with compositions and missing a formula.
+    :param verbose: Whether to print a confirmation message.
     :return df: A pandas DataFrame with chemical formula added in a new column.
     '''
     # Get only the columns that have composition
     comp_cols = [col for col in list(df) if 'ACTUAL COMP' in col]
     df_ = df[comp_cols]
 
-    # Generate a list of chemical formulas
-    formulas_list = []
-    for index, row in df_.iterrows():
-        # Loop through the compositions and add to the formula
-        formula = ''
-        for col in comp_cols:
-            # Only add the element if it has a non-zero composition
-            if row[col] > 1e-3:
-                # A little complicated to account for floats to string conversion
-                formula += col.split(' ')[2] + '{0:.5f}'.format(row[col]/100).rstrip('0')
-
-        formulas_list.append(formula)
+    # Build the formulas column by column, for all rows at once
+    formulas = np.full(len(df_), '')
+    for col in comp_cols:
+        values = df_[col].to_numpy(dtype=float)
+        # A little complicated to account for floats to string conversion;
+        # each distinct composition is formatted only once
+        fractions, inverse = np.unique(values / 100, return_inverse=True)
+        amounts = np.char.rstrip(np.char.mod('%.5f', fractions), '0')[inverse]
+        # Only add the element if it has a non-zero composition
+        formulas = np.char.add(
+            formulas,
+            np.where(values > 1e-3, np.char.add(col.split(' ')[2], amounts), '')
+        )
+    formulas_list = formulas.tolist()
 
     # Add the chemical formula as a new column
     df['FORMULA'] = formulas_list
-    print('Chemical formula column was added to the dataset.')
+    if verbose:
+        print('Chemical formula column was added to the dataset.')
     return df
 
 
-def fix_fatigue_strength(df):
+def fix_fatigue_strength(df, verbose=True):
     '''
     This function takes in a pandas DataFrame and multiplies cells where the
     Fatigue Strength is too small by 1000.
 
     :param df: A pandas DataFrame with erroneous values for Fatigue Strength.
+    :param verbose: Whether to print a confirmation message.
     :return df: A pandas DataFrame with corrected values.
     '''
     prop_name = 'PROPERTY: Fatigue Strength'
-    for index, row in df.iterrows():
-        if row[prop_name] < 10.0:
-            df.at[index, prop_name] *= 1000
-    print('{} values have been corrected.'.format(prop_name))
+    too_small = df[prop_name] < 10.0
+    df.loc[too_small, prop_name] *= 1000
+    if verbose:
+        print('{} values have been corrected.'.format(prop_name))
     return df
 
 
-def csv_to_pifs(df, fpath):
+def classify_pif_columns(columns):
+    '''
+    This function decides once, for a whole schema, what role each column
+    plays in a PIF: a composition (ACTUAL COMP), a property (PROPERTY), or
+    neither.
+
+    :param columns: An iterable of column names.
+    :return roles: A list of (column position, role, name) tuples, where role
+        is 'composition' (name is the element) or 'property' (name is the
+        property name); other columns are left out.
+    '''
+    roles = []
+    for position, col in enumerate(columns):
+        if 'ACTUAL COMP' in col:
+            roles.append((position, 'composition', col.split(' ')[2]))
+        elif 'PROPERTY' in col:
+            roles.append((position, 'property', ' '.join(col.split(' ')[1:])))
+    return roles
+
+
+class PifWriter:
+    '''
+    This class writes ChemicalSystems to a file one DataFrame chunk at a time,
+    so memory use does not grow with the number of rows. Use it as a context
+    manager; the file is a valid JSON array once it is closed. Writes go to
+    a temporary file next to fpath, which replaces fpath only on close(); if
+    the with block raises, the temporary file is removed and fpath is left
+    untouched.
+
+    Styles:
+        'indent'  - a JSON array indented like pif.dump(systems, f, indent=4)
+        'compact' - a JSON array without whitespace
+        'ndjson'  - one compact JSON object per line, not wrapped in an array
+
+    Example:
+        with PifWriter('data/out.json', style='compact') as writer:
+            for chunk in pd.read_csv('data/cleaned.csv', chunksize=10000):
+                writer.write_frame(chunk)
+    '''
+    def __init__(self, fpath, style='indent'):
+        if style not in ('indent', 'compact', 'ndjson'):
+            raise ValueError('Unknown PIF output style: {}'.format(style))
+        self.fpath = fpath
+        self.style = style
+        self.n_written = 0
+        self._roles = {}
+        self._tmp = '{}.{}.tmp'.format(fpath, os.urandom(4).hex())
+        self._file = open(self._tmp, 'x')
+        if style != 'ndjson':
+            self._file.write('[')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_system(self, system):
+        '''
+        Append a single PIF object to the file.
+        '''
+        if self.style == 'indent':
+            text = pif.dumps(system, indent=4).replace('\n', '\n    ')
+            self._file.write(('\n    ' if self.n_written == 0 else ',\n    ') + text)
+        elif self.style == 'compact':
+            text = pif.dumps(system, separators=(',', ':'))
+            self._file.write(text if self.n_written == 0 else ',' + text)
+        else:
+            self._file.write(pif.dumps(system, separators=(',', ':')) + '\n')
+        self.n_written += 1
+
+    def write_frame(self, df):
+        '''
+        Convert each row of a DataFrame to a ChemicalSystem and append it.
+
+        :param df: A pandas DataFrame with cleaned data and a FORMULA column.
+        '''
+        # Column roles are resolved once per schema, not once per row
+        columns = tuple(df.columns)
+        if columns not in self._roles:
+            self._roles[columns] = classify_pif_columns(columns)
+        roles = self._roles[columns]
+        i_formula = columns.index('FORMULA')
+
+        # Columns are converted to lists once, rather than a Series per row
+        for row in zip(*(df[col].tolist() for col in columns)):
+            system = ChemicalSystem()
+            system.chemical_formula = row[i_formula]
+
+            # Empty lists to store composition and properties
+            composition = []
+            properties = []
+            for position, role, name in roles:
+                value = row[position]
+                # Parse non-zero compositions
+                if role == 'composition':
+                    if value > 1e-3:
+                        comp = Composition()
+                        comp.element = name
+                        comp.actual_weight_percent = Scalar(value=value)
+                        composition.append(comp)
+                # Parse all remaining properties
+                else:
+                    prop = Property()
+                    prop.name = name
+                    prop.scalars = [Scalar(value=value)]
+                    properties.append(prop)
+            system.composition = composition
+            system.properties = properties
+
+            self.write_system(system)
+
+    def close(self):
+        '''
+        Terminate the JSON array and move the file into place at fpath.
+        '''
+        if self._file.closed:
+            return
+        if self.style == 'indent':
+            self._file.write('\n]' if self.n_written else ']')
+        elif self.style == 'compact':
+            self._file.write(']')
+        self._file.close()
+        os.replace(self._tmp, self.fpath)
+
+    def abort(self):
+        '''
+        Discard everything written, leaving fpath as it was.
+        '''
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self._tmp)
+
+
+def csv_to_pifs(df, fpath, style='indent'):
     '''
     This function takes in a pandas DataFrame and filepath writes a PIF
     with the data from the DataFrame to the filepath.
 
-    :param df: A pandas DataFrame with cleaned data.
+    :param df: A pandas DataFrame with cleaned data, or an iterable of
+        DataFrame chunks, e.g. pd.read_csv(..., chunksize=10000).
+    :param fpath: A string filepath for the PIF file.
+    :param style: 'indent' (default), 'compact' or 'ndjson'; see PifWriter.
     :return: None
     '''
-    # Create empty list to store ChemicalSystem objects
-    systems = []
-
-    # Loop through rows to create a ChemicalSystem for each entry
-    for i, row in df.iterrows():
-        system = ChemicalSystem()
-        system.chemical_formula = row['FORMULA']
-
-        # Empty lists to store composition and properties
-        composition = []
-        properties = []
-        for col in list(df):
-            # Parse non-zero compositions
-            if 'ACTUAL COMP' in col:
-                if row[col] > 1e-3:
-                    comp = Composition()
-                    comp.element = col.split(' ')[2]
-                    comp.actual_weight_percent = Scalar(value=row[col])
-                    composition.append(comp)
-            # Parse all remaining properties
-            elif 'PROPERTY' in col:
-                prop = Property()
-                prop.name = ' '.join(col.split(' ')[1:])
-                prop.scalars = [Scalar(value=row[col])]
-                properties.append(prop)
-        system.composition = composition
-        system.properties = properties
-
-        systems.append(system)
-
-    with open(fpath, 'w') as f:
-        pif.dump(systems, f, indent=4)
+    chunks = [df] if isinstance(df, pd.DataFrame) else df
+
+    # Systems are written as they are created, one chunk at a time
+    with PifWriter(fpath, style=style) as writer:
+        for chunk in chunks:
+            writer.write_frame(chunk)
 
     print('PIFs created and saved!')
 
 
+def retry_with_backoff(function, timeout=240, base_delay=1.0, max_delay=30.0):
+    '''
+    This function calls function() until it succeeds, sleeping between
+    attempts for an exponentially growing, randomly jittered delay.
+
+    :param function: A function of no arguments.
+    :param timeout: Seconds after which to stop retrying.
+    :param base_delay: Upper bound in seconds of the first delay.
+    :param max_delay: Upper bound in seconds of any one delay.
+    :return: The return value of function().
+    '''
+    start = monotonic()
+    attempt = 0
+    while True:
+        try:
+            return function()
+        except Exception as error:
+            # "Full jitter": uniform on [0, min(max_delay, base * 2^attempt)]
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            if monotonic() - start + delay >= timeout:
+                raise RuntimeError("Possible AWS timeout, try re-running.") \
+                    from error
+            attempt += 1
+            sleep(delay)
+
+
+def shard_pif_file(fpath, shard_dir, shard_size=1000):
+    '''
+    This function splits a PIF file holding a JSON array into shard files
+    of at most shard_size PIFs each, streaming the source file.
+
+    :param fpath: A string filepath for the PIF on the local system.
+    :param shard_dir: A string path to the directory for the shards.
+    :param shard_size: The maximum number of PIFs per shard.
+    :return shards: A list of the shard filepaths, in order.
+    '''
+    os.makedirs(shard_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(fpath))[0]
+    shards = []
+
+    def write(records):
+        shard = os.path.join(
+            shard_dir, '{}.shard{:05d}.json'.format(stem, len(shards)))
+        with open(shard, 'w') as f:
+            json.dump(records, f)
+        shards.append(shard)
+
+    records = []
+    for record in _iterJsonArray(fpath):
+        records.append(record)
+        if len(records) == shard_size:
+            write(records)
+            records = []
+    if records or not shards:
+        write(records)
+
+    return shards
+
+
+def upload_pif_shards(client, dataset_id, fpath, shard_size=1000,
+                      max_workers=4, manifest_path=None, timeout=240):
+    '''
+    This function uploads a large PIF file to an existing dataset as shards,
+    several at a time, retrying each shard with exponential backoff. A local
+    JSON manifest records the shards and which have been uploaded, so calling
+    it again after an interruption only uploads the remaining shards. The
+    manifest also records the size and modification time of fpath, and a
+    resume refuses to run if the file has changed since. The shards, their
+    directory and the manifest are removed once every shard is uploaded.
+
+    :param client: A CitrinationClient instance, or anything with a
+        compatible client.data.upload(dataset_id, source_path).
+    :param dataset_id: The ID of the dataset to upload to.
+    :param fpath: A string filepath for the PIF on the local system.
+    :param shard_size: The maximum number of PIFs per shard.
+    :param max_workers: The number of concurrent uploads.
+    :param manifest_path: A string filepath for the manifest; defaults to
+        fpath + '.upload.json'.
+    :param timeout: Seconds to keep retrying each shard.
+    :return manifest: The manifest dict.
+    '''
+    if manifest_path is None:
+        manifest_path = fpath + '.upload.json'
+    stat = os.stat(fpath)
+    source_stamp = [stat.st_size, stat.st_mtime_ns]
+
+    # Resume from the manifest, or shard the file and start one
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    else:
+        shard_dir = fpath + '.shards'
+        shards = shard_pif_file(fpath, shard_dir, shard_size)
+        manifest = {
+            'source': fpath,
+            'source_stamp': source_stamp,
+            'shard_dir': shard_dir,
+            'dataset_id': dataset_id,
+            'shards': {shard: False for shard in shards},
+        }
+    if str(manifest['dataset_id']) != str(dataset_id):
+        raise ValueError('{} belongs to dataset {}, not {}'.format(
+            manifest_path, manifest['dataset_id'], dataset_id))
+    if manifest.get('source_stamp') != source_stamp:
+        raise ValueError('{} has changed since {} was written; remove the '
+                         'manifest to upload it afresh'.format(
+                             fpath, manifest_path))
+
+    lock = threading.Lock()
+
+    def save():
+        # Atomic rewrite, so an interruption never leaves a partial manifest
+        tmp = manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp, manifest_path)
+
+    def upload(shard):
+        retry_with_backoff(
+            lambda: client.data.upload(dataset_id, shard), timeout=timeout)
+        with lock:
+            manifest['shards'][shard] = True
+            save()
+
+    pending = [shard for shard, done in manifest['shards'].items() if not done]
+    save()
+    print('Uploading {} of {} shards...'.format(
+        len(pending), len(manifest['shards'])))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Raise the first failure, after the other uploads have finished
+        for future in [pool.submit(upload, shard) for shard in pending]:
+            future.result()
+
+    # Finished; clean up so that the next upload of fpath starts afresh
+    for shard in manifest['shards']:
+        os.remove(shard)
+    try:
+        os.rmdir(manifest['shard_dir'])
+    except OSError:
+        pass  # holds other files
+    os.remove(manifest_path)
+    return manifest
+
+
 def create_and_upload_data(client, fpath, dataset_name, dataset_desc,
-                           public_flag=False):
+                           public_flag=False, shard_size=None, max_workers=4):
     '''
     This function creates a dataset on Citrination and uploads the data
     stored in PIF format at the specified filepath.
 
+    With shard_size set, the file is uploaded in shards by upload_pif_shards();
+    if an earlier sharded upload of the same file was interrupted, it resumes
+    into the same dataset instead of creating a new one.
+
     :param client: A CitrinationClient instance.
     :param fpath: A string filepath for the PIF on the local system.
     :param dataset_name: The string name for the dataset.
     :param dataset_desc: The string description for the dataset.
-    :return: None
+    :param public_flag: Whether the dataset is public.
+    :param shard_size: The maximum number of PIFs per shard; None uploads
+        the file in one piece.
+    :param max_workers: The number of concurrent shard uploads.
+    :return: The dataset ID.
     '''
-    # Create dataset and obtain ID
-    dataset = client.data.create_dataset(name=dataset_name,
-                                         description=dataset_desc,
-                                         public=public_flag)
-    dataset_id = dataset.id
+    manifest_path = fpath + '.upload.json'
+    if shard_size is not None and os.path.exists(manifest_path):
+        # Resume the interrupted upload
+        with open(manifest_path, 'r') as f:
+            dataset_id = json.load(f)['dataset_id']
+    else:
+        # Create dataset and obtain ID
+        dataset = client.data.create_dataset(name=dataset_name,
+                                             description=dataset_desc,
+                                             public=public_flag)
+        dataset_id = dataset.id
 
     # Upload data to dataset; guard against AWS timeout
-    start = time()
-    timeout = 240
-    while time() - start < timeout:
-        sleep(1)
-        try:
-            print('Uploading data...')
-            client.data.upload(dataset_id, fpath)
-            break
-        except:
-            if time() - start>=timeout:
-                raise RuntimeError("Possible AWS timeout, try re-running.")
-            continue
+    if shard_size is None:
+        print('Uploading data...')
+        retry_with_backoff(lambda: client.data.upload(dataset_id, fpath))
+        n_files = 1
+    else:
+        manifest = upload_pif_shards(client, dataset_id, fpath,
+                                     shard_size=shard_size,
+                                     max_workers=max_workers,
+                                     manifest_path=manifest_path)
+        n_files = len(manifest['shards'])
 
-    assert (client.data.matched_file_count(dataset_id) >= 1), "Upload failed."
+    assert (client.data.matched_file_count(dataset_id) >= n_files), "Upload failed."
     return dataset_id
 
 
+class CleaningPipeline:
+    '''
+    This class records the steps of the data cleaning workflow without running
+    them. Calling run() or run_csv() applies every step to the data in a
+    single pass, so no intermediate CSV files are written, and reports how
+    long each step took.
+
+    Steps work row by row, so run_csv() can stream a CSV larger than memory
+    through the pipeline in chunks. When reading in chunks, the file is first
+    scanned once to find each column's dtype over the whole file, so every
+    chunk is parsed, filled and written as a single read would be. The scan
+    is an extra read of the file; it is skipped when a dtype dict covering
+    every column is passed, or with scan_dtypes=False (chunks then infer
+    their own dtypes).
+
+    Example:
+        pipeline = (CleaningPipeline()
+                    .rename_columns(header_mapping)
+                    .fillna(0)
+                    .add_iron_composition()
+                    .add_chemical_formula()
+                    .fix_fatigue_strength())
+        pipeline.run_csv('data/messy_data.csv', 'data/cleaned.csv')
+    '''
+    def __init__(self):
+        self.steps = []
+        self.timings = {}
+
+    def add_step(self, name, function, **kwargs):
+        '''
+        Record a step; function(df, **kwargs) must return the new DataFrame.
+
+        :param name: A string name for the step, used in the timing report.
+        :param function: A function taking and returning a DataFrame.
+        :return self: The pipeline, so that steps can be chained.
+        '''
+        self.steps.append((name, function, kwargs))
+        return self
+
+    def rename_columns(self, mapping):
+        return self.add_step('rename columns', rename_columns_in_df,
+                             mapping=mapping, verbose=False)
+
+    def fillna(self, value=0):
+        return self.add_step('fill missing values', pd.DataFrame.fillna,
+                             value=value)
+
+    def add_iron_composition(self):
+        return self.add_step('add iron composition', add_iron_composition,
+                             verbose=False)
+
+    def add_chemical_formula(self):
+        return self.add_step('add chemical formula', add_chemical_formula,
+                             verbose=False)
+
+    def fix_fatigue_strength(self):
+        return self.add_step('fix fatigue strength', fix_fatigue_strength,
+                             verbose=False)
+
+    def _time(self, name, function, *args, **kwargs):
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        self.timings[name] = self.timings.get(name, 0.0) + perf_counter() - start
+        return result
+
+    def _apply(self, df):
+        for name, function, kwargs in self.steps:
+            df = self._time(name, function, df, **kwargs)
+        return df
+
+    def run(self, df, verbose=True):
+        '''
+        Apply every step to a DataFrame in memory.
+
+        :param df: A pandas DataFrame with the raw data.
+        :param verbose: Whether to print the timing report.
+        :return df: The cleaned pandas DataFrame.
+        '''
+        self.timings = {}
+        df = self._apply(df)
+        if verbose:
+            self.report()
+        return df
+
+    @staticmethod
+    def _scan_dtypes(src, chunksize, read_kwargs):
+        # Dtype of each column over the whole file, from chunked reads: mixed
+        # int/float columns become float, any other mix becomes object
+        dtypes = {}
+        for chunk in pd.read_csv(src, chunksize=chunksize, **read_kwargs):
+            for column, dtype in chunk.dtypes.items():
+                seen = dtypes.setdefault(column, dtype)
+                if seen == dtype:
+                    continue
+                if all(pd.api.types.is_numeric_dtype(t) and
+                       not pd.api.types.is_bool_dtype(t) for t in (seen, dtype)):
+                    dtypes[column] = np.result_type(seen, dtype)
+                else:
+                    dtypes[column] = np.dtype(object)
+        return dtypes
+
+    def _stream(self, src, chunksize, read_kwargs, scan_dtypes=True):
+        # Yield cleaned chunks of a CSV file, timing the reads
+        if chunksize is None:
+            chunks = iter([self._time('read', pd.read_csv, src, **read_kwargs)])
+        else:
+            ## Parse every chunk with the whole file's dtypes; given ones win
+            given = read_kwargs.get('dtype')
+            if isinstance(given, dict):
+                header = pd.read_csv(src, nrows=0, **read_kwargs).columns
+                scan_dtypes = scan_dtypes and not set(header) <= set(given)
+            if scan_dtypes and (given is None or isinstance(given, dict)):
+                dtypes = self._time('read', self._scan_dtypes, src, chunksize,
+                                    read_kwargs)
+                dtypes.update(given or {})
+                read_kwargs = dict(read_kwargs, dtype=dtypes)
+            chunks = pd.read_csv(src, chunksize=chunksize, **read_kwargs)
+        while True:
+            chunk = self._time('read', next, chunks, None)
+            if chunk is None:
+                return
+            yield self._apply(chunk)
+
+    def run_csv(self, src, dst, chunksize=None, verbose=True, scan_dtypes=True,
+                **read_kwargs):
+        '''
+        Stream a CSV file through the pipeline and write only the final CSV.
+
+        :param src: A string filepath to the raw CSV file.
+        :param dst: A string filepath for the cleaned CSV file.
+        :param chunksize: Number of rows per chunk; None reads the whole file.
+        :param verbose: Whether to print the timing report.
+        :param scan_dtypes: With a chunksize, first read the file once for
+            its dtypes, so chunks match a single read.
+        :param read_kwargs: Passed to pd.read_csv().
+        :return n_rows: The number of rows written.
+        '''
+        self.timings = {}
+        n_rows = 0
+        with open(dst, 'w', newline='') as f:
+            for chunk in self._stream(src, chunksize, read_kwargs, scan_dtypes):
+                self._time('write', chunk.to_csv, f, index=False,
+                           header=(n_rows == 0))
+                n_rows += chunk.shape[0]
+
+        if verbose:
+            self.report()
+        return n_rows
+
+    def run_pifs(self, src, fpath, chunksize=None, style='indent',
+                 verbose=True, scan_dtypes=True, **read_kwargs):
+        '''
+        Stream a CSV file through the pipeline and write the PIFs directly,
+        as csv_to_pifs() would.
+
+        :param src: A string filepath to the raw CSV file.
+        :param fpath: A string filepath for the PIF file.
+        :param chunksize: Number of rows per chunk; None reads the whole file.
+        :param style: 'indent' (default), 'compact' or 'ndjson'; see PifWriter.
+        :param verbose: Whether to print the timing report.
+        :param scan_dtypes: As for run_csv().
+        :param read_kwargs: Passed to pd.read_csv().
+        :return n_rows: The number of PIFs written.
+        '''
+        self.timings = {}
+        with PifWriter(fpath, style=style) as writer:
+            for chunk in self._stream(src, chunksize, read_kwargs, scan_dtypes):
+                self._time('write', writer.write_frame, chunk)
+
+        if verbose:
+            self.report()
+        return writer.n_written
+
+    def report(self):
+        '''
+        Print the time spent in each step of the last run.
+        '''
+        total = sum(self.timings.values())
+        for name, seconds in self.timings.items():
+            print('{0:<24} {1:8.3f} s'.format(name, seconds))
+        print('{0:<24} {1:8.3f} s'.format('total', total))
+
+
 
 # Extra function; not used
 def create_mapping_from_table_w_units(header_csv):
@@ -478,34 +3014,35 @@ def create_mapping_from_table_w_units(header_csv):
     :param header_csv: A string filepath to the CSV file.
     :return mapping: A dictionary mapping abbreviation to full name.
     '''
-    mapping = {}
     df = pd.read_csv(header_csv)
-
-    # Read each row of the df
-    for index, row in df.iterrows():
-        # Check for composition column; keep as is
-        if row['Details'].startswith('%'):
-            mapping[row['Abbreviation']] = 'ACTUAL COMPOSITION: {} (wt %)'.format(
-                row['Abbreviation'])
-
-        # Check for fatigue strength column
-        elif 'fatigue' in row['Details'].lower():
-            mapping[row['Abbreviation']] = 'PROPERTY: {} (MPa)'.format(row['Details'])
-
-        # Check for temperature column
-        elif 'temperature' in row['Details'].lower():
-            mapping[row['Abbreviation']] = 'PROPERTY: {} (C)'.format(row['Details'])
-
-        # Check for time column
-        elif 'time' in row['Details'].lower():
-            mapping[row['Abbreviation']] = 'PROPERTY: {} (min)'.format(row['Details'])
-
-        # Check for rate column
-        elif 'rate' in row['Details'].lower():
-            mapping[row['Abbreviation']] = 'PROPERTY: {} (C/hr)'.format(row['Details'])
-
-        else:
-            mapping[row['Abbreviation']] = 'PROPERTY: {}'.format(row['Details'])
+    abbreviation = df['Abbreviation'].astype(str)
+    details = df['Details'].astype(str)
+    lower = details.str.lower()
+
+    # Conditions are checked in order; the first match wins
+    names = np.select(
+        [
+            # Composition column; keep as is
+            details.str.startswith('%'),
+            # Fatigue strength column
+            lower.str.contains('fatigue', regex=False),
+            # Temperature column
+            lower.str.contains('temperature', regex=False),
+            # Time column
+            lower.str.contains('time', regex=False),
+            # Rate column
+            lower.str.contains('rate', regex=False),
+        ],
+        [
+            'ACTUAL COMPOSITION: ' + abbreviation + ' (wt %)',
+            'PROPERTY: ' + details + ' (MPa)',
+            'PROPERTY: ' + details + ' (C)',
+            'PROPERTY: ' + details + ' (min)',
+            'PROPERTY: ' + details + ' (C/hr)',
+        ],
+        default='PROPERTY: ' + details
+    )
+    mapping = dict(zip(df['Abbreviation'], names.tolist()))
 
     print('Mapping dictionary successfully created.')
     return mapping